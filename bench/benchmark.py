@@ -0,0 +1,199 @@
+"""Benchmarks for the hashids module.
+
+Measures the latency and throughput of `Hashids.encode`, `decode`,
+`encode_hex` and `decode_hex` and of the constructor, with the same and with
+a new salt on every call. Each parameter (value count, value size,
+`min_length`, alphabet, salt length) is varied on its own, starting from a
+default configuration. The throughput of `encode_threaded` and
+`decode_threaded` is measured for several thread counts; it only scales where
+threads run in parallel, e.g. on free-threaded CPython. Results are written
+as JSON, so that the results of two revisions can be compared:
+
+    python bench/benchmark.py --output before.json
+    git checkout other-revision
+    python bench/benchmark.py --output after.json
+    python bench/benchmark.py --compare before.json after.json
+
+The module is imported from the parent directory of this file, so the
+benchmarks always run against the checked-out revision.
+"""
+
+import argparse
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+import os
+import platform
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashids  # noqa: E402
+from hashids import Hashids  # noqa: E402
+
+VALUE_BITS = [('small', 8), ('int32', 32), ('int64', 64), ('bits1024', 1024),
+              ('bits4096', 4096)]
+VALUE_COUNTS = [1, 3, 10]
+MIN_LENGTHS = [0, 16, 64]
+ALPHABETS = [('default', Hashids.ALPHABET),
+             ('lowercase', 'abcdefghijklmnopqrstuvwxyz'),
+             ('short', 'abcdefghijklmnopq'),
+             ('punctuation', '!"#%&\',-/0123456789:;<=>ABCDEFGHIJKLMNOPQRSTUV'
+                             'WXYZ_`abcdefghijklmnopqrstuvwxyz~')]
+SALT_LENGTHS = [0, 8, 32]
+HEX_LENGTHS = [24, 32, 128, 1024]
+THREAD_COUNTS = [1, 2, 4, 8]
+THREADED_ITEMS = 20000
+
+DEFAULTS = dict(count=1, bits=32, min_length=0, alphabet='default',
+                salt_length=8)
+
+
+def measure(func, args, repeat, min_time):
+    """Returns the per-call times of the fastest and the median of `repeat`
+    runs. Each run calls `func` often enough to last about `min_time`
+    seconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    times = sorted(t / number for t in timer.repeat(repeat, number))
+    return times[0], times[len(times) // 2]
+
+
+def make_values(rnd, count, bits):
+    """Returns `count` random values of exactly `bits` bits."""
+    return tuple(rnd.getrandbits(bits) | (1 << (bits - 1))
+                 for _ in range(count))
+
+
+def cases():
+    """Yields `(name, params)` pairs, varying one parameter at a time."""
+    yield 'default', dict(DEFAULTS)
+    for count in VALUE_COUNTS:
+        yield 'count=%d' % count, dict(DEFAULTS, count=count)
+    for name, bits in VALUE_BITS:
+        yield 'bits=%s' % name, dict(DEFAULTS, bits=bits)
+    for min_length in MIN_LENGTHS:
+        yield 'min_length=%d' % min_length, dict(DEFAULTS,
+                                                 min_length=min_length)
+    for name, _ in ALPHABETS:
+        yield 'alphabet=%s' % name, dict(DEFAULTS, alphabet=name)
+    for salt_length in SALT_LENGTHS:
+        yield 'salt_length=%d' % salt_length, dict(DEFAULTS,
+                                                   salt_length=salt_length)
+
+
+def run(repeat, min_time, results):
+    """Runs all benchmarks and adds their results to the dict `results`.
+    Benchmarks of methods the checked-out revision lacks are skipped."""
+    rnd = random.Random(0)
+    alphabets = dict(ALPHABETS)
+
+    def record(name, func, args, items=1):
+        best, median = measure(func, args, repeat, min_time)
+        best, median = best / items, median / items
+        results[name] = dict(best=best, median=median, ops=1.0 / median)
+        print('%-40s %10.2f us %12.0f ops/s' % (name, median * 1e6,
+                                               1.0 / median))
+
+    seen = set()
+    for case, params in cases():
+        key = tuple(sorted(params.items()))
+        if key in seen:
+            continue
+        seen.add(key)
+        salt = ''.join(rnd.choice(Hashids.ALPHABET)
+                       for _ in range(params['salt_length']))
+        alphabet = alphabets[params['alphabet']]
+        h = Hashids(salt, params['min_length'], alphabet)
+        values = make_values(rnd, params['count'], params['bits'])
+        hashid = h.encode(*values)
+        record('encode/%s' % case, h.encode, values)
+        record('decode/%s' % case, h.decode, (hashid,))
+        record('decode_invalid/%s' % case, h.decode, (hashid[::-1] + '!',))
+        record('constructor/%s' % case, Hashids,
+               (salt, params['min_length'], alphabet))
+        # A new salt per call, as for per-tenant instances, so that the
+        # derived tables are never reused.
+        salts = ('%s%d' % (salt, i) for i in itertools.count())
+        record('constructor_new_salt/%s' % case,
+               lambda: Hashids(next(salts), params['min_length'], alphabet),
+               ())
+
+    h = Hashids('benchmark salt')
+    for length in HEX_LENGTHS:
+        hex_str = ''.join(rnd.choice('0123456789abcdef')
+                          for _ in range(length))
+        record('encode_hex/length=%d' % length, h.encode_hex, (hex_str,))
+        record('decode_hex/length=%d' % length, h.decode_hex,
+               (h.encode_hex(hex_str),))
+
+    if not hasattr(Hashids, 'encode_threaded'):
+        return results
+    h = Hashids('benchmark salt', 8)
+    values = [make_values(rnd, 2, 32) for _ in range(THREADED_ITEMS)]
+    encoded = [h.encode(*v) for v in values]
+    for threads in THREAD_COUNTS:
+        with ThreadPoolExecutor(threads) as executor:
+            record('encode_threaded/threads=%d' % threads,
+                   lambda: list(h.encode_threaded(values, threads,
+                                                  executor=executor)),
+                   (), THREADED_ITEMS)
+            record('decode_threaded/threads=%d' % threads,
+                   lambda: list(h.decode_threaded(encoded, threads,
+                                                  executor=executor)),
+                   (), THREADED_ITEMS)
+
+    return results
+
+
+def compare(before_file, after_file):
+    """Prints the median times of two result files side by side."""
+    with open(before_file) as f:
+        before = json.load(f)['results']
+    with open(after_file) as f:
+        after = json.load(f)['results']
+    print('%-40s %12s %12s %8s' % ('benchmark', 'before (us)', 'after (us)',
+                                   'speedup'))
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name]['median'], after[name]['median']
+        print('%-40s %12.2f %12.2f %7.2fx' % (name, old * 1e6, new * 1e6,
+                                               old / new))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', help='write results to this file')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per benchmark (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.02,
+                        help='minimum duration of each run in seconds')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {}
+    try:
+        run(args.repeat, args.min_time, results)
+    finally:
+        # Results collected before an error or interruption are kept.
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(dict(version=hashids.__version__,
+                               python=platform.python_version(),
+                               implementation=platform.python_implementation(),
+                               machine=platform.machine(),
+                               gil=getattr(sys, '_is_gil_enabled',
+                                           lambda: True)(),
+                               results=results), f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
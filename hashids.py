@@ -1,13 +1,77 @@
 """Implements the hashids algorithm in python. For more information, visit http://hashids.org/"""
 
+import io
+import json
+import mmap
+import os
+import re
+import struct
+import sys
 import warnings
-from functools import wraps
+from array import array
+from binascii import hexlify, unhexlify
+from collections import OrderedDict, deque, namedtuple
+from functools import partial, wraps
+from itertools import islice
 from math import ceil
+from multiprocessing import cpu_count
+from threading import Lock
+from uuid import UUID
+from zlib import crc32
 
 __version__ = '1.3.1'
 
 RATIO_SEPARATORS = 3.5
 RATIO_GUARDS = 12
+DEFAULT_CACHE_SIZE = 1024
+TABLES_CACHE_SIZE = 256
+CACHE_SHARDS = 16
+MIN_SHARD_SIZE = 64
+DEFAULT_CHUNK_SIZE = 1000
+IO_BUFFER_SIZE = 1 << 20
+SPLIT_DIGITS = 64
+LARGE_NUMBER = 1 << 512
+DEFAULT_TABLE_BOUND = 1 << 20
+
+# NumPy is imported on first use by `_import_numpy`, because importing it
+# takes much longer than importing this module.
+numpy = NotImplemented
+
+
+def _import_numpy():
+    """Imports NumPy once and returns it, or None if it is not installed."""
+    global numpy
+    if numpy is NotImplemented:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+
+try:
+    _range = xrange
+except NameError:
+    _range = range
+
+try:
+    _INT_TYPES = (int, long)
+except NameError:
+    _INT_TYPES = (int,)
+
+try:
+    _maketrans, _byte_maketrans = str.maketrans, bytes.maketrans
+except AttributeError:
+    from string import maketrans as _byte_maketrans
+
+    def _maketrans(characters, replacements):
+        """`str.maketrans` for unicode strings on Python 2."""
+        return dict(zip(map(ord, characters), replacements))
 
 try:
     StrType = basestring
@@ -15,6 +79,21 @@ except NameError:
     StrType = str
 
 
+try:
+    _int_from_bytes = int.from_bytes
+except AttributeError:
+    def _int_from_bytes(data, byteorder):
+        return int(hexlify(data), 16)
+
+
+def _int_to_bytes(number, length):
+    """Returns `number` as big endian byte string of `length` bytes."""
+    try:
+        return number.to_bytes(length, 'big')
+    except AttributeError:
+        return unhexlify('%0*x' % (2 * length, number))
+
+
 def _is_str(candidate):
     """Returns whether a value is a string."""
     return isinstance(candidate, StrType)
@@ -28,6 +107,14 @@ def _is_uint(number):
         return False
 
 
+def _is_uint64(number):
+    """Returns whether a value is an unsigned integer below 2**64."""
+    try:
+        return _is_uint(number) and number < 2 ** 64
+    except (TypeError, OverflowError):
+        return False
+
+
 def _split(string, splitters):
     """Splits a string into parts at multiple characters"""
     part = ''
@@ -42,6 +129,8 @@ def _split(string, splitters):
 
 def _hash(number, alphabet):
     """Hashes `number` using the given `alphabet` sequence."""
+    if number >= LARGE_NUMBER:
+        return _hash_large(number, alphabet)
     hashed = ''
     len_alphabet = len(alphabet)
     while True:
@@ -51,17 +140,75 @@ def _hash(number, alphabet):
             return hashed
 
 
-def _unhash(hashed, alphabet):
-    """Restores a number tuple from hashed using the given `alphabet` index."""
-    number = 0
+def _hash_large(number, alphabet):
+    """Hashes a large `number` by recursively splitting it at powers of the
+    alphabet length, instead of producing one digit per division."""
     len_alphabet = len(alphabet)
+    # powers[i] == len_alphabet ** (SPLIT_DIGITS * 2 ** i)
+    powers = [len_alphabet ** SPLIT_DIGITS]
+    while powers[-1] ** 2 <= number:
+        powers.append(powers[-1] ** 2)
+
+    def convert(number, level, pad):
+        if level < 0:
+            digits = []
+            while number:
+                number, digit = divmod(number, len_alphabet)
+                digits.append(alphabet[digit])
+            if pad:
+                digits.extend(alphabet[0] * (SPLIT_DIGITS - len(digits)))
+            return ''.join(reversed(digits)) or alphabet[0]
+        high, low = divmod(number, powers[level])
+        if high or pad:
+            return (convert(high, level - 1, pad) +
+                    convert(low, level - 1, True))
+        return convert(low, level - 1, False)
+
+    return convert(number, len(powers) - 1, False)
+
+
+def _unhash(hashed, alphabet_index):
+    """Restores a number from hashed using the given `alphabet_index`, a
+    mapping of characters to their position in the alphabet."""
+    if len(hashed) > SPLIT_DIGITS:
+        return _unhash_large(hashed, alphabet_index)
+    number = 0
+    len_alphabet = len(alphabet_index)
     for character in hashed:
-        position = alphabet.index(character)
+        try:
+            position = alphabet_index[character]
+        except KeyError:
+            raise ValueError('%r is not in the alphabet' % character)
         number *= len_alphabet
         number += position
     return number
 
 
+def _unhash_large(hashed, alphabet_index):
+    """Restores a number from a long `hashed` string by recursively combining
+    the numbers of both halves, instead of accumulating one digit at a
+    time."""
+    len_alphabet = len(alphabet_index)
+    powers = {}
+
+    def convert(hashed):
+        if len(hashed) <= SPLIT_DIGITS:
+            return _unhash(hashed, alphabet_index)
+        middle = len(hashed) // 2
+        len_low = len(hashed) - middle
+        if len_low not in powers:
+            powers[len_low] = len_alphabet ** len_low
+        return convert(hashed[:middle]) * powers[len_low] + \
+            convert(hashed[middle:])
+
+    return convert(hashed)
+
+
+def _alphabet_index(alphabet):
+    """Returns a mapping of each character in `alphabet` to its position."""
+    return dict((character, i) for i, character in enumerate(alphabet))
+
+
 def _reorder(string, salt):
     """Reorders `string` according to `salt`."""
     len_salt = len(salt)
@@ -80,12 +227,173 @@ def _reorder(string, salt):
     return string
 
 
+def _chained_alphabet(alphabet, lottery, salt, depth, cache):
+    """Returns the alphabet used for the value at position `depth`, given the
+    alphabet of the previous position, together with its character index.
+    Results are memoized in the `_AlphabetCache` `cache`, keyed by lottery
+    character and position."""
+    if depth:
+        key = (lottery, depth)
+        entry = cache.get(key)
+    else:
+        entry = cache.first.get(lottery)
+    if entry is None:
+        alphabet_salt = (lottery + salt + alphabet)[:len(alphabet)]
+        shuffled = _reorder(alphabet, alphabet_salt)
+        entry = shuffled, _alphabet_index(shuffled)
+        if depth:
+            cache.set(key, entry)
+        elif cache.maxsize:
+            cache.first[lottery] = entry
+    return entry
+
+
+CacheInfo = namedtuple('CacheInfo',
+                       'hits misses evictions maxsize currsize')
+
+_MISSING = object()
+
+
+class _LRUCache(object):
+    """A bounded, thread-safe mapping that evicts least recently used
+    entries."""
+
+    def __init__(self, maxsize):
+        self.maxsize = max(int(maxsize), 0)
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns the value for `key` and marks it as recently used."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        """Stores `value` for `key`, evicting the oldest entry if full."""
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def info(self):
+        """Returns the statistics of the cache as `CacheInfo`."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions,
+                             self.maxsize, len(self._data))
+
+
+class _ShardedLRUCache(object):
+    """An `_LRUCache` split into shards by key hash, each with its own lock
+    and an equal part of `maxsize`, so that threads using the cache at the
+    same time rarely wait for each other. Entries are evicted per shard."""
+
+    def __init__(self, maxsize, shards):
+        self.maxsize = max(int(maxsize), 0)
+        self._shards = tuple(_LRUCache(-(-self.maxsize // shards))
+                             for _ in _range(shards))
+        self._count = shards
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def get(self, key, default=None):
+        """Returns the value for `key` and marks it as recently used."""
+        return self._shards[hash(key) % self._count].get(key, default)
+
+    def set(self, key, value):
+        """Stores `value` for `key`, evicting the oldest entry of its shard
+        if full."""
+        self._shards[hash(key) % self._count].set(key, value)
+
+    def info(self):
+        """Returns the statistics of the cache as `CacheInfo`."""
+        infos = [shard.info() for shard in self._shards]
+        return CacheInfo(sum(info.hits for info in infos),
+                         sum(info.misses for info in infos),
+                         sum(info.evictions for info in infos),
+                         self.maxsize, sum(info.currsize for info in infos))
+
+
+def _lru_cache(maxsize, shards=1):
+    """Returns an `_LRUCache` of `maxsize` entries, or with several `shards`
+    a `_ShardedLRUCache` of as many of them as have at least
+    `MIN_SHARD_SIZE` entries."""
+    shards = min(int(shards), max(int(maxsize), 0) // MIN_SHARD_SIZE)
+    if shards > 1:
+        return _ShardedLRUCache(maxsize, shards)
+    return _LRUCache(maxsize)
+
+
+class _AlphabetCache(object):
+    """The shuffled alphabets and paddings of a configuration.
+
+    The alphabets of the first value, one per lottery character, are used by
+    every call. They are kept in the dict `first`, which is read without
+    locking and only ever gains entries. All others are kept in an LRU cache
+    of `maxsize` entries, split into `shards`. With `maxsize` 0 nothing is
+    kept."""
+
+    def __init__(self, maxsize, shards=1):
+        self.first = {}
+        self._lru = _lru_cache(maxsize, shards)
+        self.maxsize = self._lru.maxsize
+
+    def __len__(self):
+        return len(self.first) + len(self._lru)
+
+    def get(self, key, default=None):
+        """Returns the value for `key` from the LRU cache."""
+        return self._lru.get(key, default)
+
+    def set(self, key, value):
+        """Stores `value` for `key` in the LRU cache."""
+        self._lru.set(key, value)
+
+
 def _index_from_ratio(dividend, divisor):
     """Returns the ceiled ratio of two numbers as int."""
     return int(ceil(float(dividend) / divisor))
 
 
-def _ensure_length(encoded, min_length, alphabet, guards, values_hash):
+def _padding(alphabet, length, min_length):
+    """Returns the characters that `_ensure_length` adds before and after a
+    guarded hashid of `length` characters to reach `min_length`, given the
+    alphabet of its last value.
+
+    Each pass reorders the alphabet and wraps the hashid in its halves. Only
+    the last pass can overshoot, and the excess it trims never exceeds the
+    characters it added on either side, so the padding can be computed
+    without the hashid itself."""
+    left = right = ''
+    split_at = len(alphabet) // 2
+    while length + len(left) + len(right) < min_length:
+        alphabet = _reorder(alphabet, alphabet)
+        left = alphabet[split_at:] + left
+        right += alphabet[:split_at]
+        excess = length + len(left) + len(right) - min_length
+        if excess > 0:
+            from_index = excess // 2
+            left = left[from_index:]
+            right = right[:len(right) - (excess - from_index)]
+    return left, right
+
+
+def _ensure_length(encoded, min_length, alphabet, guards, values_hash, cache):
     """Ensures the minimal hash length"""
     len_guards = len(guards)
     guard_index = (values_hash + ord(encoded[0])) % len_guards
@@ -95,29 +403,129 @@ def _ensure_length(encoded, min_length, alphabet, guards, values_hash):
         guard_index = (values_hash + ord(encoded[2])) % len_guards
         encoded += guards[guard_index]
 
-    split_at = len(alphabet) // 2
-    while len(encoded) < min_length:
-        alphabet = _reorder(alphabet, alphabet)
-        encoded = alphabet[split_at:] + encoded + alphabet[:split_at]
-        excess = len(encoded) - min_length
-        if excess > 0:
-            from_index = excess // 2
-            encoded = encoded[from_index:from_index+min_length]
+    if len(encoded) < min_length:
+        padding = _cached_padding(alphabet, len(encoded), min_length, cache)
+        encoded = padding[0] + encoded + padding[1]
 
     return encoded
 
 
-def _encode(values, salt, min_length, alphabet, separators, guards):
-    """Helper function that does the hash building without argument checks."""
+def _cached_padding(alphabet, length, min_length, cache):
+    """Returns the result of `_padding`, taken from `cache` if possible."""
+    key = (alphabet, length, min_length)
+    padding = cache.get(key)
+    if padding is None:
+        padding = _padding(alphabet, length, min_length)
+        cache.set(key, padding)
+    return padding
+
+
+def _character_class(characters):
+    """Returns a regular expression character class of `characters`."""
+    return '[%s]' % ''.join(re.escape(x) for x in characters)
+
+
+def _character_pattern(characters):
+    """Returns a compiled regular expression matching any of `characters`."""
+    return re.compile(_character_class(characters))
+
+
+# The structure of hashids, in terms of the roles of their characters (see
+# `_hashid_structure`): a lottery character and digits, with single
+# separators between values, optionally wrapped in guards and padding. The
+# `padded` group is set when the guarded form matched.
+_STRUCTURE = re.compile(u'(?:aa+(?:sa+)*|(?P<padded>a*gaa+(?:sa+)*(?:ga*)?))'
+                        u'\\Z')
+
+
+def _hashid_structure(alphabet, separators, guards):
+    """Returns a translation table that maps the characters of hashids to
+    their roles, 'a' for the alphabet, 's' for separators and 'g' for guards,
+    to be matched against `_STRUCTURE`. All other characters are mapped to
+    '-' or left unchanged, and fail to match, including 'a', 's' and 'g'
+    themselves. For alphabets of code points below 256, the table is a
+    string of 256 characters indexed by code point."""
+    characters = u'asg' + alphabet + separators + guards
+    roles = (u'---' + u'a' * len(alphabet) + u's' * len(separators) +
+             u'g' * len(guards))
+    try:
+        table = _byte_maketrans(characters.encode('latin-1'),
+                                roles.encode('latin-1'))
+    except UnicodeEncodeError:
+        return _maketrans(characters, roles)
+    return table.decode('latin-1')
+
+
+def _byte_class(characters):
+    """Returns a regular expression for bytes matching any of the UTF-8
+    encoded `characters`."""
+    encoded = [bytearray(_utf8(x)) for x in characters]
+    if all(len(x) == 1 for x in encoded):
+        return '[%s]' % ''.join(sorted(set('\\x%02x' % x[0]
+                                           for x in encoded)))
+    return '(?:%s)' % '|'.join(''.join('\\x%02x' % byte for byte in x)
+                               for x in encoded)
+
+
+def _token_pattern(alphabet, separators, guards, encoded=False):
+    """Returns a compiled regular expression matching the longest runs of
+    characters of hashids that have the structure of a hashid, see
+    `_STRUCTURE`. With `encoded`, it matches UTF-8 encoded runs in
+    bytes. Lookbehind assertions need a fixed width, so there only single
+    byte characters are excluded before the run; runs following other
+    characters of hashids must be rejected with `_preceding_character`."""
+    any_of = _byte_class if encoded else _character_class
+    charset = alphabet + separators + guards
+    excluded = charset
+    if encoded:
+        excluded = ''.join(x for x in charset if len(_utf8(x)) == 1)
+    before = '(?<!%s)' % any_of(excluded) if excluded else ''
+    core = '{a}{a}+(?:{s}{a}+)*'.format(a=any_of(alphabet),
+                                        s=any_of(separators))
+    pattern = '{b}(?:{core}|{a}*{g}{core}(?:{g}{a}*)?)(?!{c})'.format(
+        b=before, c=any_of(charset), core=core, a=any_of(alphabet),
+        g=any_of(guards))
+    return re.compile(pattern.encode('ascii') if encoded else pattern)
+
+
+def _preceding_character(data, position):
+    """Returns the character ending at `position` in the UTF-8 encoded
+    `data`, or an empty string if there is none or it is not valid UTF-8."""
+    tail = bytearray(data[max(position - 4, 0):position])
+    for start in _range(len(tail) - 1, -1, -1):
+        if not 0x80 <= tail[start] < 0xc0:
+            try:
+                return bytes(tail[start:]).decode('utf-8')
+            except UnicodeDecodeError:
+                break
+    return u''
+
+
+def _is_plausible(hashid, structure, min_length):
+    """Cheaply checks whether `hashid` has the character set, length, guards
+    and segments of a hashid. Hashids failing this check cannot be decoded,
+    hashids passing it may still be invalid."""
+    if isinstance(hashid, bytes):
+        hashid = hashid.decode('utf-8')
+    match = _STRUCTURE.match(hashid.translate(structure))
+    if match is None:
+        return False
+    if match.group('padded') is None:
+        return len(hashid) >= min_length
+    return len(hashid) == min_length
+
+
+def _encode_unpadded(values, salt, alphabet, separators, cache):
+    """Builds a hashid without guards and padding. Returns it together with
+    the alphabet of the last value and the values hash, which are needed for
+    padding."""
 
-    len_alphabet = len(alphabet)
     len_separators = len(separators)
     values_hash = sum(x % (i + 100) for i, x in enumerate(values))
     encoded = lottery = alphabet[values_hash % len(alphabet)]
 
     for i, value in enumerate(values):
-        alphabet_salt = (lottery + salt + alphabet)[:len_alphabet]
-        alphabet = _reorder(alphabet, alphabet_salt)
+        alphabet, _ = _chained_alphabet(alphabet, lottery, salt, i, cache)
         last = _hash(value, alphabet)
         encoded += last
         value %= ord(last[0]) + i
@@ -125,27 +533,488 @@ def _encode(values, salt, min_length, alphabet, separators, guards):
 
     encoded = encoded[:-1]  # cut off last separator
 
+    return encoded, alphabet, values_hash
+
+
+def _encode(values, salt, min_length, alphabet, separators, guards, cache):
+    """Helper function that does the hash building without argument checks."""
+    encoded, alphabet, values_hash = _encode_unpadded(values, salt, alphabet,
+                                                      separators, cache)
+
     return (encoded if len(encoded) >= min_length else
-            _ensure_length(encoded, min_length, alphabet, guards, values_hash))
+            _ensure_length(encoded, min_length, alphabet, guards, values_hash,
+                           cache))
 
 
-def _decode(hashid, salt, alphabet, separators, guards):
-    """Helper method that restores the values encoded in a hashid without
-    argument checks."""
+def _decode(hashid, salt, min_length, alphabet, separators, guards, cache):
+    """Helper function that restores the values encoded in a hashid without
+    argument checks.
+
+    Instead of encoding the restored values again, every step of `_encode` is
+    verified while decoding: canonical digits, separator choice, lottery
+    character, and guards and padding. An empty tuple is returned for any
+    `hashid` that `_encode` would not produce."""
     parts = tuple(_split(hashid, guards))
-    hashid = parts[1] if 2 <= len(parts) <= 3 else parts[0]
+    encoded = parts[1] if 2 <= len(parts) <= 3 else parts[0]
+
+    if not encoded:
+        return ()
 
-    if not hashid:
-        return
+    lottery = encoded[0]
+    len_separators = len(separators)
+    values = []
+    rebuilt = [lottery]
+    values_hash = 0
+    base_alphabet = alphabet
+
+    hash_parts = _split(encoded[1:], separators)
+    for i, part in enumerate(hash_parts):
+        alphabet, alphabet_index = _chained_alphabet(alphabet, lottery, salt,
+                                                     i, cache)
+        if not part or (len(part) > 1 and part[0] == alphabet[0]):
+            return ()  # not the shortest representation of the value
+        value = _unhash(part, alphabet_index)
+        values.append(value)
+        values_hash += value % (i + 100)
+        rebuilt.append(part)
+        rebuilt.append(separators[value % (ord(part[0]) + i) % len_separators])
+
+    rebuilt.pop()  # cut off last separator
+    if (lottery != base_alphabet[values_hash % len(base_alphabet)] or
+            ''.join(rebuilt) != encoded):
+        return ()
+
+    if len(encoded) < min_length:
+        encoded = _ensure_length(encoded, min_length, alphabet, guards,
+                                 values_hash, cache)
 
-    lottery_char = hashid[0]
-    hashid = hashid[1:]
+    return tuple(values) if hashid == encoded else ()
 
-    hash_parts = _split(hashid, separators)
-    for part in hash_parts:
-        alphabet_salt = (lottery_char + salt + alphabet)[:len(alphabet)]
-        alphabet = _reorder(alphabet, alphabet_salt)
-        yield _unhash(part, alphabet)
+
+def _encode_uint64(values, salt, min_length, alphabet, guards, cache):
+    """Vectorized `_encode` for a NumPy array of single uint64 values.
+
+    Digits are computed for the whole array at once and translated to
+    characters with a table indexed by lottery and digit. Guards and padding
+    are added to all hashids of the same length at once, with padding
+    computed once per lottery. Returns an array of strings."""
+    len_alphabet = len(alphabet)
+    values_hash = values % 100
+    lotteries = (values_hash % len_alphabet).astype(numpy.intp)
+
+    shuffled = {}
+    table = numpy.zeros((len_alphabet, len_alphabet), dtype=numpy.uint32)
+    for lottery in numpy.unique(lotteries).tolist():
+        shuffled[lottery], _ = _chained_alphabet(alphabet, alphabet[lottery],
+                                                 salt, 0, cache)
+        table[lottery] = [ord(x) for x in shuffled[lottery]]
+
+    max_digits = len(_hash(2 ** 64 - 1, alphabet))
+    digits = numpy.empty((len(values), max_digits), dtype=numpy.intp)
+    num_digits = numpy.ones(len(values), dtype=numpy.intp)
+    remaining = values.copy()
+    for k in range(max_digits):
+        digits[:, k] = remaining % len_alphabet
+        remaining //= len_alphabet
+        num_digits += remaining > 0
+
+    width = max_digits + 1
+    codes = numpy.zeros((len(values), width), dtype=numpy.uint32)
+    alphabet_codes = numpy.array([ord(x) for x in alphabet],
+                                 dtype=numpy.uint32)
+    codes[:, 0] = alphabet_codes[lotteries]
+    rows = numpy.arange(len(values))
+    for k in range(max_digits):
+        mask = k < num_digits
+        codes[rows[mask], num_digits[mask] - k] = \
+            table[lotteries[mask], digits[mask, k]]
+
+    lengths = num_digits + 1
+    if not (lengths < min_length).any():
+        return codes.view('U%d' % width)[:, 0]
+
+    padded = numpy.zeros((len(values), max(width, min_length)),
+                         dtype=numpy.uint32)
+    padded[:, :width] = codes
+    guard_codes = numpy.array([ord(x) for x in guards], dtype=numpy.uint32)
+    hashes = values_hash.astype(numpy.intp)
+    first_guards = guard_codes[(hashes + codes[:, 0]) % len(guards)]
+    last_guards = guard_codes[(hashes + codes[:, 1]) % len(guards)]
+    for length in numpy.unique(lengths[lengths < min_length]).tolist():
+        rows = numpy.flatnonzero(lengths == length)
+        parts = [first_guards[rows, None], codes[rows, :length]]
+        if length + 1 < min_length:
+            parts.append(last_guards[rows, None])
+        if length + 2 < min_length:
+            paddings = dict(
+                (lottery, _cached_padding(shuffled[lottery], length + 2,
+                                          min_length, cache))
+                for lottery in numpy.unique(lotteries[rows]).tolist())
+            left, right = [numpy.zeros((len_alphabet, len(x)),
+                                       dtype=numpy.uint32)
+                           for x in next(iter(paddings.values()))]
+            for lottery, (left_padding, right_padding) in paddings.items():
+                left[lottery] = [ord(x) for x in left_padding]
+                right[lottery] = [ord(x) for x in right_padding]
+            parts = ([left[lotteries[rows]]] + parts +
+                     [right[lotteries[rows]]])
+        padded[rows, :min_length] = numpy.concatenate(parts, axis=1)
+
+    return padded.view('U%d' % padded.shape[1])[:, 0]
+
+
+def _decode_uint64(hashids, salt, min_length, alphabet, guards, cache):
+    """Vectorized `_decode` for a NumPy array of hashids of single uint64
+    values.
+
+    Returns an array of values and a boolean array telling which hashids were
+    valid. The characters between the guards of padded hashids are decoded
+    like unpadded ones, and all candidates are verified by encoding their
+    values again."""
+    hashids = numpy.ascontiguousarray(hashids, dtype=numpy.str_)
+    width = max(hashids.dtype.itemsize // 4, 1)
+    codes = hashids.view(numpy.uint32).reshape(len(hashids), width)
+    lengths = numpy.char.str_len(hashids)
+    positions = numpy.arange(width)
+    in_hashid = positions < lengths[:, None]
+
+    guard_codes = numpy.array([ord(x) for x in guards], dtype=numpy.uint32)
+    is_guard = numpy.isin(codes, guard_codes) & in_hashid
+    num_guards = is_guard.sum(axis=1)
+    starts = numpy.where(num_guards > 0, is_guard.argmax(axis=1) + 1, 0)
+    after_start = is_guard & (positions >= starts[:, None])
+    lengths = numpy.where(after_start.any(axis=1), after_start.argmax(axis=1),
+                          lengths) - starts
+
+    max_digits = len(_hash(2 ** 64 - 1, alphabet))
+    width = max_digits + 1
+    core_positions = starts[:, None] + numpy.arange(width)
+    in_hashid = numpy.arange(width) < lengths[:, None]
+    codes = numpy.where(in_hashid, numpy.take_along_axis(
+        codes, numpy.minimum(core_positions, codes.shape[1] - 1), axis=1), 0)
+
+    len_alphabet = len(alphabet)
+    sorted_codes = numpy.array(sorted(ord(x) for x in alphabet),
+                               dtype=numpy.uint32)
+    ranks = numpy.minimum(numpy.searchsorted(sorted_codes, codes),
+                          len_alphabet - 1)
+    known = (sorted_codes[ranks] == codes) & in_hashid
+
+    valid = ((num_guards <= 2) & (lengths >= 2) & (lengths <= width) &
+             (known == in_hashid).all(axis=1))
+
+    digit_table = numpy.zeros((len_alphabet, len_alphabet), dtype=numpy.uint64)
+    lotteries = numpy.where(valid, ranks[:, 0], 0)
+    for lottery in numpy.unique(lotteries[valid]):
+        lottery_char = chr(sorted_codes[lottery])
+        shuffled, _ = _chained_alphabet(alphabet, lottery_char, salt, 0,
+                                        cache)
+        shuffled_codes = numpy.array([ord(x) for x in shuffled],
+                                     dtype=numpy.uint32)
+        positions = numpy.searchsorted(sorted_codes, shuffled_codes)
+        digit_table[lottery, positions] = numpy.arange(len_alphabet)
+
+    values = numpy.zeros(len(hashids), dtype=numpy.uint64)
+    base = numpy.uint64(len_alphabet)
+    for k in range(1, width):
+        digits = digit_table[lotteries, ranks[:, k]]
+        values = numpy.where(in_hashid[:, k], values * base + digits, values)
+
+    candidates = numpy.flatnonzero(valid)
+    valid[candidates] = (
+        _encode_uint64(values[candidates], salt, min_length, alphabet, guards,
+                       cache) == hashids[candidates])
+
+    values[~valid] = 0
+    return values, valid
+
+
+def _to_columns(encoded, offset_type):
+    """Converts a NumPy array of strings to UTF-8 data bytes and an array of
+    `offset_type` offsets, in the layout of Arrow string arrays."""
+    encoded = numpy.ascontiguousarray(encoded, dtype=numpy.str_)
+    codes = encoded.view(numpy.uint32).reshape(len(encoded),
+                                               encoded.dtype.itemsize // 4)
+    if (codes < 0x80).all():
+        lengths = numpy.char.str_len(encoded)
+        in_hashid = numpy.arange(codes.shape[1]) < lengths[:, None]
+        data = codes[in_hashid].astype(numpy.uint8).tobytes()
+    else:
+        encoded = numpy.char.encode(encoded, 'utf-8')
+        lengths = numpy.char.str_len(encoded)
+        data = b''.join(encoded.tolist())
+
+    offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    if offsets[-1] > numpy.iinfo(offset_type).max:
+        raise ValueError('The hashids do not fit into %s offsets.' %
+                         numpy.dtype(offset_type).name)
+    return data, offsets.astype(offset_type)
+
+
+def _from_columns(data, offsets, max_length):
+    """Converts UTF-8 data bytes and offsets in the layout of Arrow string
+    arrays to a NumPy array of strings. Strings longer than `max_length`
+    bytes are replaced with empty strings."""
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+    lengths = numpy.diff(offsets)
+    lengths[lengths > max_length] = 0
+    data = numpy.frombuffer(data, dtype=numpy.uint8)
+
+    if (data[offsets[0]:offsets[-1]] < 0x80).all():
+        width = max(int(lengths.max()) if len(lengths) else 0, 1)
+        positions = numpy.arange(width)
+        in_hashid = positions < lengths[:, None]
+        codes = numpy.zeros((len(lengths), width), dtype=numpy.uint32)
+        codes[in_hashid] = data[(offsets[:-1, None] + positions)[in_hashid]]
+        return codes.view('U%d' % width)[:, 0]
+
+    data = data.tobytes()
+    return numpy.array([data[start:start + length].decode('utf-8', 'replace')
+                        for start, length in zip(offsets[:-1].tolist(),
+                                                 lengths.tolist())],
+                       dtype=numpy.str_)
+
+
+def _chunks(iterable, size):
+    """Splits `iterable` into lists of at most `size` items."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def _map_chunks(executor, func, chunks, max_pending):
+    """Maps `func` over `chunks` using `executor`, yielding the items of the
+    results in order. At most `max_pending` chunks are submitted at a time,
+    so arbitrarily long inputs are processed in bounded memory."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, chunk))
+        if len(pending) >= max_pending:
+            for result in pending.popleft().result():
+                yield result
+    while pending:
+        for result in pending.popleft().result():
+            yield result
+
+
+_worker_hashids = None
+
+
+def _init_worker(config):
+    """Builds the Hashids instance of a worker process once."""
+    global _worker_hashids
+    _worker_hashids = Hashids(*config)
+
+
+def _encode_chunk(chunk):
+    """Encodes a chunk of value tuples in a worker process."""
+    return list(_worker_hashids.encode_many(chunk))
+
+
+def _decode_chunk(chunk):
+    """Decodes a chunk of hashids in a worker process."""
+    return list(_worker_hashids.decode_many(chunk))
+
+
+REJECTED_TYPE = 'type'
+REJECTED_CHARACTERS = 'characters'
+REJECTED_LENGTH = 'length'
+REJECTED_STRUCTURE = 'structure'
+REJECTED_VERIFICATION = 'verification'
+REJECTED_VALUE_ERROR = 'value_error'
+
+
+class HashidsStats(object):
+    """Collects statistics of the Hashids instances it is passed to.
+
+    Counts calls to `encode` and `decode`, the time spent in both and in
+    padding for `min_length`, the number of rejected hashids by reason, and
+    the sizes of encoded and decoded values in a histogram keyed by the
+    smallest power of two (at least 8) of bits that holds each value. Calls
+    with values that cannot be encoded are counted, but their values are
+    not.
+
+    Rejection reasons are `REJECTED_TYPE` (empty or not a string),
+    `REJECTED_CHARACTERS` (characters outside the alphabet),
+    `REJECTED_LENGTH` (too short, or padded to a different length),
+    `REJECTED_STRUCTURE` (misplaced guards or empty values),
+    `REJECTED_VERIFICATION` (not what encoding the values produces) and
+    `REJECTED_VALUE_ERROR`.
+
+    Statistics can be shared by several instances and threads.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Sets all statistics to zero."""
+        with self._lock:
+            self.encode_calls = self.decode_calls = self.padding_calls = 0
+            self.encode_time = self.decode_time = self.padding_time = 0.0
+            self.rejections = {}
+            self.value_bits = {}
+
+    def snapshot(self):
+        """Returns a consistent copy of all statistics as dict."""
+        with self._lock:
+            return dict(encode_calls=self.encode_calls,
+                        encode_time=self.encode_time,
+                        decode_calls=self.decode_calls,
+                        decode_time=self.decode_time,
+                        padding_calls=self.padding_calls,
+                        padding_time=self.padding_time,
+                        rejections=dict(self.rejections),
+                        value_bits=dict(self.value_bits))
+
+    def _count_values(self, values):
+        for value in values:
+            bits = 8
+            while value >> bits:
+                bits *= 2
+            self.value_bits[bits] = self.value_bits.get(bits, 0) + 1
+
+    def _record_encode(self, values, elapsed, padding_elapsed):
+        with self._lock:
+            self.encode_calls += 1
+            self.encode_time += elapsed
+            if padding_elapsed is not None:
+                self.padding_calls += 1
+                self.padding_time += padding_elapsed
+            self._count_values(values)
+
+    def _record_decode(self, numbers, elapsed, rejection):
+        with self._lock:
+            self.decode_calls += 1
+            self.decode_time += elapsed
+            if rejection is None:
+                self._count_values(numbers)
+            else:
+                self.rejections[rejection] = \
+                    self.rejections.get(rejection, 0) + 1
+
+
+def _encode_list(hashids, chunk):
+    """Encodes a chunk of value tuples with `hashids`."""
+    return list(hashids.encode_many(chunk))
+
+
+def _decode_list(hashids, chunk):
+    """Decodes a chunk of hashids with `hashids`."""
+    return list(hashids.decode_many(chunk))
+
+
+class _AsyncChunks(object):
+    """Asynchronous iterator over the items of `func` applied to chunks of an
+    iterable or asynchronous iterable.
+
+    Each chunk is processed in a later iteration of the event loop, or in
+    `executor` if given, so other tasks run between chunks. Chunks are
+    collected and processed one at a time, results are yielded in input
+    order.
+
+    Implemented with futures and callbacks rather than an asynchronous
+    generator, so that the module keeps working on Python versions without
+    `async` syntax."""
+
+    def __init__(self, func, iterable, chunk_size, executor):
+        self._func = func
+        self._chunk_size = max(int(chunk_size), 1)
+        self._executor = executor
+        self._results = deque()
+        self._exhausted = False
+        if hasattr(iterable, '__aiter__'):
+            self._source = iterable.__aiter__()
+            self._is_async = True
+        else:
+            self._source = iter(iterable)
+            self._is_async = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        if self._results:
+            future.set_result(self._results.popleft())
+        elif self._exhausted:
+            future.set_exception(StopAsyncIteration())
+        elif self._is_async:
+            self._pull(loop, future, [])
+        else:
+            chunk = list(islice(self._source, self._chunk_size))
+            self._process(loop, future, chunk)
+        return future
+
+    def _pull(self, loop, future, chunk):
+        """Collects a chunk from the asynchronous source, one item at a
+        time."""
+        import asyncio
+        if len(chunk) >= self._chunk_size:
+            self._process(loop, future, chunk)
+            return
+
+        def on_item(item):
+            if future.cancelled():
+                return
+            if item.cancelled():
+                future.cancel()
+            elif isinstance(item.exception(), StopAsyncIteration):
+                self._process(loop, future, chunk)
+            elif item.exception() is not None:
+                future.set_exception(item.exception())
+            else:
+                chunk.append(item.result())
+                self._pull(loop, future, chunk)
+
+        asyncio.ensure_future(self._source.__anext__()).add_done_callback(
+            on_item)
+
+    def _process(self, loop, future, chunk):
+        """Processes `chunk` and resolves `future` with its first result."""
+        if not chunk:
+            self._exhausted = True
+            future.set_exception(StopAsyncIteration())
+            return
+
+        def deliver(results):
+            if future.cancelled():
+                return
+            self._results.extend(results)
+            future.set_result(self._results.popleft())
+
+        def run():
+            if future.cancelled():
+                return
+            try:
+                results = self._func(chunk)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                deliver(results)
+
+        if self._executor is None:
+            loop.call_soon(run)
+            return
+
+        def on_done(results):
+            if future.cancelled():
+                return
+            if results.cancelled():
+                future.cancel()
+            elif results.exception() is not None:
+                future.set_exception(results.exception())
+            else:
+                deliver(results.result())
+
+        loop.run_in_executor(self._executor, self._func,
+                             chunk).add_done_callback(on_done)
 
 
 def _deprecated(func, name):
@@ -162,56 +1031,137 @@ def _deprecated(func, name):
     return with_warning
 
 
-class Hashids(object):
-    """Hashes and restores values using the "hashids" algorithm."""
-    ALPHABET = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890'
+def _build_tables(salt, alphabet, cache_size, cache_shards):
+    """Derives the alphabet, separators and guards of a configuration, and
+    the structure check and alphabet cache that depend on them."""
+    separators = ''.join(x for x in 'cfhistuCFHISTU' if x in alphabet)
+    if len(set(alphabet)) < len(alphabet):
+        alphabet = ''.join(OrderedDict.fromkeys(alphabet))
+    alphabet = ''.join([x for x in alphabet if x not in separators])
 
-    def __init__(self, salt='', min_length=0, alphabet=ALPHABET):
-        """
-        Initializes a Hashids object with salt, minimum length, and alphabet.
+    len_alphabet, len_separators = len(alphabet), len(separators)
+    if len_alphabet + len_separators < 16:
+        raise ValueError('Alphabet must contain at least 16 '
+                         'unique characters.')
 
-        :param salt: A string influencing the generated hash ids.
-        :param min_length: The minimum length for generated hashes
-        :param alphabet: The characters to use for the generated hash ids.
-        """
-        self._min_length = max(int(min_length), 0)
-        self._salt = salt
+    separators = _reorder(separators, salt)
 
-        separators = ''.join(x for x in 'cfhistuCFHISTU' if x in alphabet)
-        alphabet = ''.join(x for i, x in enumerate(alphabet)
-                           if alphabet.index(x) == i and x not in separators)
+    min_separators = _index_from_ratio(len_alphabet, RATIO_SEPARATORS)
 
-        len_alphabet, len_separators = len(alphabet), len(separators)
-        if len_alphabet + len_separators < 16:
-            raise ValueError('Alphabet must contain at least 16 '
-                             'unique characters.')
+    number_of_missing_separators = min_separators - len_separators
+    if number_of_missing_separators > 0:
+        separators += alphabet[:number_of_missing_separators]
+        alphabet = alphabet[number_of_missing_separators:]
+        len_alphabet = len(alphabet)
 
-        separators = _reorder(separators, salt)
+    alphabet = _reorder(alphabet, salt)
+    num_guards = _index_from_ratio(len_alphabet, RATIO_GUARDS)
+    if len_alphabet < 3:
+        guards = separators[:num_guards]
+        separators = separators[num_guards:]
+    else:
+        guards = alphabet[:num_guards]
+        alphabet = alphabet[num_guards:]
 
-        min_separators = _index_from_ratio(len_alphabet, RATIO_SEPARATORS)
+    return (alphabet, separators, guards,
+            _hashid_structure(alphabet, separators, guards),
+            _AlphabetCache(cache_size, cache_shards))
 
-        number_of_missing_separators = min_separators - len_separators
-        if number_of_missing_separators > 0:
-            separators += alphabet[:number_of_missing_separators]
-            alphabet = alphabet[number_of_missing_separators:]
-            len_alphabet = len(alphabet)
 
-        alphabet = _reorder(alphabet, salt)
-        num_guards = _index_from_ratio(len_alphabet, RATIO_GUARDS)
-        if len_alphabet < 3:
-            guards = separators[:num_guards]
-            separators = separators[num_guards:]
-        else:
-            guards = alphabet[:num_guards]
-            alphabet = alphabet[num_guards:]
+_tables_cache = _lru_cache(TABLES_CACHE_SIZE, CACHE_SHARDS)
+# Hashes of the configurations constructed once, so that only those
+# constructed again are put into `_tables_cache`. Cleared when full.
+_tables_seen = set()
 
-        self._alphabet = alphabet
-        self._guards = guards
-        self._separators = separators
 
-        # Support old API
-        self.decrypt = _deprecated(self.decode, "decrypt")
-        self.encrypt = _deprecated(self.encode, "encrypt")
+class Hashids(object):
+    """Hashes and restores values using the "hashids" algorithm.
+
+    Instances are immutable and can be shared between threads; their caches
+    are thread-safe. The alphabets of the first value are read without
+    locking, other cache entries behind locks that can be split into shards
+    with `cache_shards`. Once a salt, alphabet and cache settings are used a
+    second time, their derived tables and alphabet cache are kept in a
+    module-level cache of the `TABLES_CACHE_SIZE` most recently constructed
+    configurations and shared by later instances. Configurations used only
+    once, e.g. a salt per tenant, are not cached. Instances are pickled by
+    their configuration.
+    """
+    ALPHABET = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890'
+
+    __slots__ = ('_salt', '_min_length', '_alphabet', '_separators',
+                 '_guards', '_structure', '_alphabet_cache', '_result_cache',
+                 '_stats', '_config')
+
+    def __init__(self, salt='', min_length=0, alphabet=ALPHABET,
+                 cache_size=DEFAULT_CACHE_SIZE, result_cache_size=0,
+                 stats=None, cache_shards=1):
+        """
+        Initializes a Hashids object with salt, minimum length, and alphabet.
+
+        :param salt: A string influencing the generated hash ids.
+        :param min_length: The minimum length for generated hashes
+        :param alphabet: The characters to use for the generated hash ids.
+        :param cache_size: The maximum number of shuffled alphabets to keep
+                           for reuse across calls, besides those of the
+                           first value, which are kept for every lottery
+                           character. 0 disables the cache.
+        :param result_cache_size: The maximum number of `encode` and `decode`
+                                  results to keep, including rejected
+                                  hashids. 0, the default, disables the
+                                  cache.
+        :param stats: A `HashidsStats` object collecting statistics of
+                      `encode` and `decode` calls. Without it, no statistics
+                      are collected.
+        :param cache_shards: The number of parts with separate locks that
+                             the caches are split into, so that threads using
+                             an instance at the same time rarely wait for
+                             each other. Each part holds at least
+                             `MIN_SHARD_SIZE` entries. 1, the default, does
+                             not split the caches.
+        """
+        min_length = max(int(min_length), 0)
+        if not _is_str(alphabet):
+            alphabet = ''.join(alphabet)
+        key = (salt, alphabet, cache_size, cache_shards)
+        tables = _tables_cache.get(key)
+        if tables is None:
+            tables = _build_tables(salt, alphabet, cache_size, cache_shards)
+            key_hash = hash(key)
+            if key_hash in _tables_seen:
+                _tables_cache.set(key, tables)
+            else:
+                if len(_tables_seen) >= TABLES_CACHE_SIZE:
+                    _tables_seen.clear()
+                _tables_seen.add(key_hash)
+        result_cache = None
+        if result_cache_size > 0:
+            result_cache = _lru_cache(result_cache_size, cache_shards)
+
+        set_ = object.__setattr__
+        set_(self, '_salt', salt)
+        set_(self, '_min_length', min_length)
+        alphabet_, separators, guards, structure, alphabet_cache = tables
+        set_(self, '_alphabet', alphabet_)
+        set_(self, '_separators', separators)
+        set_(self, '_guards', guards)
+        set_(self, '_structure', structure)
+        set_(self, '_alphabet_cache', alphabet_cache)
+        set_(self, '_result_cache', result_cache)
+        set_(self, '_stats', stats)
+        set_(self, '_config', (salt, min_length, alphabet, cache_size,
+                               result_cache_size, None, cache_shards))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Hashids instances are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Hashids instances are immutable')
+
+    def __reduce__(self):
+        """Pickles the configuration rather than the state. Statistics
+        objects are not pickled."""
+        return Hashids, self._config
 
     def encode(self, *values):
         """Builds a hash from the passed `values`.
@@ -222,11 +1172,27 @@ class Hashids(object):
         >>> hashids.encode(1, 23, 456)
         '1d6216i30h53elk3'
         """
+        if self._stats is not None:
+            return self._instrumented_encode(values)
+
         if not (values and all(_is_uint(x) for x in values)):
             return ''
 
-        return _encode(values, self._salt, self._min_length, self._alphabet,
-                       self._separators, self._guards)
+        results = self._result_cache
+        # Equal values of other types, e.g. 1.0 and 1, share a key; they are
+        # encoded without the cache so that they are handled as on a miss.
+        if results is None or not all(type(x) in _INT_TYPES for x in values):
+            return _encode(values, self._salt, self._min_length,
+                           self._alphabet, self._separators, self._guards,
+                           self._alphabet_cache)
+
+        hashid = results.get(values)
+        if hashid is None:
+            hashid = _encode(values, self._salt, self._min_length,
+                             self._alphabet, self._separators, self._guards,
+                             self._alphabet_cache)
+            results.set(values, hashid)
+        return hashid
 
     def decode(self, hashid):
         """Restore a tuple of numbers from the passed `hashid`.
@@ -237,16 +1203,719 @@ class Hashids(object):
         >>> hashids.decode('1d6216i30h53elk3')
         (1, 23, 456)
         """
+        if self._stats is not None:
+            return self._instrumented_decode(hashid)
+
         if not hashid or not _is_str(hashid):
             return ()
-        try:
-            numbers = tuple(_decode(hashid, self._salt, self._alphabet,
-                                    self._separators, self._guards))
 
-            return numbers if hashid == self.encode(*numbers) else ()
+        results = self._result_cache
+        if results is None:
+            return self._decode(hashid)
+
+        numbers = results.get(hashid, _MISSING)
+        if numbers is _MISSING:
+            numbers = self._decode(hashid)
+            results.set(hashid, numbers)
+        return numbers
+
+    # Support old API
+    encrypt = _deprecated(encode, 'encrypt')
+    decrypt = _deprecated(decode, 'decrypt')
+
+    def _decode(self, hashid):
+        """Decodes a string without consulting the result cache."""
+        if not _is_plausible(hashid, self._structure, self._min_length):
+            return ()
+        try:
+            return _decode(hashid, self._salt, self._min_length,
+                           self._alphabet, self._separators, self._guards,
+                           self._alphabet_cache)
         except ValueError:
             return ()
 
+    def _instrumented_encode(self, values):
+        """`encode` recording statistics. Bypasses the result cache."""
+        start = perf_counter()
+        if not (values and all(_is_uint(x) for x in values)):
+            self._stats._record_encode((), perf_counter() - start, None)
+            return ''
+
+        encoded, alphabet, values_hash = _encode_unpadded(
+            values, self._salt, self._alphabet, self._separators,
+            self._alphabet_cache)
+        padding_elapsed = None
+        if len(encoded) < self._min_length:
+            padding_start = perf_counter()
+            encoded = _ensure_length(encoded, self._min_length, alphabet,
+                                     self._guards, values_hash,
+                                     self._alphabet_cache)
+            padding_elapsed = perf_counter() - padding_start
+
+        self._stats._record_encode(values, perf_counter() - start,
+                                   padding_elapsed)
+        return encoded
+
+    def _instrumented_decode(self, hashid):
+        """`decode` recording statistics. Bypasses the result cache."""
+        start = perf_counter()
+        numbers, rejection = (), None
+        if not hashid or not _is_str(hashid):
+            rejection = REJECTED_TYPE
+        elif not _is_plausible(hashid, self._structure, self._min_length):
+            rejection = self._rejection_reason(hashid)
+        else:
+            try:
+                numbers = _decode(hashid, self._salt, self._min_length,
+                                  self._alphabet, self._separators,
+                                  self._guards, self._alphabet_cache)
+            except ValueError:
+                rejection = REJECTED_VALUE_ERROR
+            else:
+                if not numbers:
+                    rejection = REJECTED_VERIFICATION
+
+        self._stats._record_decode(numbers, perf_counter() - start, rejection)
+        return numbers
+
+    def _rejection_reason(self, hashid):
+        """Tells why a string does not have the structure of a hashid."""
+        if not set(hashid).issubset(self._alphabet + self._separators +
+                                    self._guards):
+            return REJECTED_CHARACTERS
+        if len(hashid) < self._min_length or (
+                len(hashid) > self._min_length and
+                not set(hashid).isdisjoint(self._guards)):
+            return REJECTED_LENGTH
+        return REJECTED_STRUCTURE
+
+    def cache_info(self):
+        """Returns hit, miss and eviction counts and the size of the result
+        cache as a `CacheInfo` named tuple.
+
+        >>> hashids = Hashids(result_cache_size=100)
+        >>> hashids.decode('jR'), hashids.decode('jR')
+        ((1,), (1,))
+        >>> hashids.cache_info()
+        CacheInfo(hits=1, misses=1, evictions=0, maxsize=100, currsize=1)
+        """
+        if self._result_cache is None:
+            return CacheInfo(0, 0, 0, 0, 0)
+        return self._result_cache.info()
+
+    def is_valid(self, hashid):
+        """Returns whether `hashid` can be decoded.
+
+        Strings with characters, guards, separators or a length that no
+        hashid of this instance can have are rejected without decoding.
+
+        :param hashid The hashid to check
+
+        >>> hashids = Hashids()
+        >>> hashids.is_valid('o2fXhV'), hashids.is_valid('o2fXh-')
+        (True, False)
+        """
+        return bool(self.decode(hashid))
+
+    def compile(self, arity=1):
+        """Returns an `(encode, decode)` pair of functions specialized for
+        hashids of exactly `arity` values.
+
+        The shuffled alphabets for every lottery character are computed up
+        front. With an arity of 1, `encode` takes a single value, otherwise it
+        takes exactly `arity` values and raises TypeError for any other
+        number. `decode` returns an empty tuple for hashids with a different
+        number of values, which is detected by counting separators before
+        decoding.
+
+        :param arity The number of values in each hashid
+
+        >>> encode, decode = Hashids().compile()
+        >>> encode(12345)
+        'j0gW'
+        >>> decode('j0gW')
+        (12345,)
+        >>> decode('o2fXhV')
+        ()
+        """
+        arity = int(arity)
+        if arity < 1:
+            raise ValueError('arity must be at least 1')
+
+        salt, min_length, alphabet = (self._salt, self._min_length,
+                                      self._alphabet)
+        separators, guards, cache = (self._separators, self._guards,
+                                     self._alphabet_cache)
+        len_alphabet, len_separators = len(alphabet), len(separators)
+        is_uint, is_str = _is_uint, _is_str
+
+        chains = {}
+        for lottery in alphabet:
+            shuffled, chain = alphabet, []
+            for i in range(arity):
+                shuffled, _ = _chained_alphabet(shuffled, lottery, salt, i,
+                                                cache)
+                chain.append(shuffled)
+            chains[lottery] = chain
+
+        if arity == 1:
+            first_alphabets = dict((lottery, chain[0])
+                                   for lottery, chain in chains.items())
+
+            def encode(value):
+                if not is_uint(value):
+                    return ''
+                values_hash = value % 100
+                lottery = alphabet[values_hash % len_alphabet]
+                shuffled = first_alphabets[lottery]
+                encoded = lottery + _hash(value, shuffled)
+                if len(encoded) < min_length:
+                    encoded = _ensure_length(encoded, min_length, shuffled,
+                                             guards, values_hash, cache)
+                return encoded
+        else:
+            def encode(*values):
+                if len(values) != arity:
+                    raise TypeError('expected %d values, got %d' %
+                                    (arity, len(values)))
+                for value in values:
+                    if not is_uint(value):
+                        return ''
+                values_hash = sum(x % (i + 100) for i, x in enumerate(values))
+                lottery = alphabet[values_hash % len_alphabet]
+                chain = chains[lottery]
+                encoded = [lottery]
+                for i, value in enumerate(values):
+                    last = _hash(value, chain[i])
+                    encoded.append(last)
+                    encoded.append(separators[value % (ord(last[0]) + i) %
+                                              len_separators])
+                encoded.pop()  # cut off last separator
+                encoded = ''.join(encoded)
+                if len(encoded) < min_length:
+                    encoded = _ensure_length(encoded, min_length, chain[-1],
+                                             guards, values_hash, cache)
+                return encoded
+
+        structure = self._structure
+
+        def decode(hashid):
+            if not hashid or not is_str(hashid):
+                return ()
+            if sum(map(hashid.count, separators)) != arity - 1:
+                return ()
+            if not _is_plausible(hashid, structure, min_length):
+                return ()
+            try:
+                return _decode(hashid, salt, min_length, alphabet, separators,
+                               guards, cache)
+            except ValueError:
+                return ()
+
+        if arity == 1:
+            generic_decode = decode
+            separator_set, guard_set = frozenset(separators), frozenset(guards)
+            first_indexes = dict((lottery, _alphabet_index(shuffled))
+                                 for lottery, shuffled
+                                 in first_alphabets.items())
+
+            def decode(hashid):
+                if not hashid or not is_str(hashid):
+                    return ()
+                if not separator_set.isdisjoint(hashid):
+                    return ()
+                if not guard_set.isdisjoint(hashid):
+                    return generic_decode(hashid)  # padded
+                lottery, digits = hashid[0], hashid[1:]
+                if (lottery not in first_alphabets or len(hashid) < min_length
+                        or not digits):
+                    return ()
+                if len(digits) > 1 and \
+                        digits[0] == first_alphabets[lottery][0]:
+                    return ()
+                try:
+                    value = _unhash(digits, first_indexes[lottery])
+                except ValueError:
+                    return ()
+                if lottery != alphabet[value % 100 % len_alphabet]:
+                    return ()
+                return (value,)
+
+        return encode, decode
+
+    def encode_range(self, start, stop=None, step=1):
+        """Builds the hashids of single values for the integers in
+        `range(start, stop, step)`.
+
+        Hashids of single values use one of at most 100 shuffled alphabets,
+        depending on the value modulo 100. All of them are computed once,
+        using the encoder returned by `compile`, so each value only needs to
+        be converted to digits.
+
+        :param start The first value, or the end of the range if `stop` is
+                     not given
+        :param stop The end of the range (exclusive)
+        :param step The difference between consecutive values
+
+        >>> list(Hashids().encode_range(1, 4))
+        ['jR', 'k5', 'l5']
+        """
+        if stop is None:
+            start, stop = 0, start
+        encode = self.compile(1)[0]
+        for value in _range(start, stop, step):
+            yield encode(value)
+
+    def encode_many(self, values_iterable):
+        """Builds a hashid for each tuple of values in `values_iterable`.
+
+        Yields one hashid per tuple, or an empty string where `encode` would
+        return one.
+
+        :param values_iterable An iterable of value tuples
+
+        >>> hashids = Hashids()
+        >>> list(hashids.encode_many([(1, 2, 3), (12345,)]))
+        ['o2fXhV', 'j0gW']
+        """
+        salt, min_length, alphabet = (self._salt, self._min_length,
+                                      self._alphabet)
+        separators, guards, cache = (self._separators, self._guards,
+                                     self._alphabet_cache)
+        is_uint = _is_uint
+        for values in values_iterable:
+            if not values:
+                yield ''
+                continue
+            for value in values:
+                if not is_uint(value):
+                    yield ''
+                    break
+            else:
+                yield _encode(values, salt, min_length, alphabet, separators,
+                              guards, cache)
+
+    def decode_many(self, hashids):
+        """Restores a tuple of numbers from each hashid in `hashids`.
+
+        Yields one tuple per hashid, or an empty tuple where `decode` would
+        return one.
+
+        :param hashids An iterable of hashids
+
+        >>> hashids = Hashids()
+        >>> list(hashids.decode_many(['o2fXhV', 'j0gW']))
+        [(1, 2, 3), (12345,)]
+        """
+        salt, min_length, alphabet = (self._salt, self._min_length,
+                                      self._alphabet)
+        separators, guards, cache = (self._separators, self._guards,
+                                     self._alphabet_cache)
+        is_str, is_plausible = _is_str, _is_plausible
+        structure = self._structure
+        for hashid in hashids:
+            if not hashid or not is_str(hashid) or \
+                    not is_plausible(hashid, structure, min_length):
+                yield ()
+                continue
+            try:
+                yield _decode(hashid, salt, min_length, alphabet, separators,
+                              guards, cache)
+            except ValueError:
+                yield ()
+
+    def encode_parallel(self, values_iterable, processes=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+        """Like `encode_many`, but spreads the work over a pool of worker
+        processes.
+
+        The input is split into chunks of `chunk_size` tuples. Each worker
+        builds its own Hashids instance once from this instance's
+        configuration. Hashids are yielded in input order.
+
+        :param values_iterable An iterable of value tuples
+        :param processes The number of worker processes, defaults to the
+                         number of CPUs
+        :param chunk_size The number of tuples sent to a worker at a time
+        """
+        return self._in_process_pool(_encode_chunk, values_iterable,
+                                     processes, chunk_size)
+
+    def decode_parallel(self, hashids, processes=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+        """Like `decode_many`, but spreads the work over a pool of worker
+        processes. See `encode_parallel` for the parameters.
+
+        :param hashids An iterable of hashids
+        """
+        return self._in_process_pool(_decode_chunk, hashids, processes,
+                                     chunk_size)
+
+    def encode_threaded(self, values_iterable, threads=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+        """Like `encode_many`, but spreads the work over a pool of threads.
+
+        The input is split into chunks of `chunk_size` tuples, which are
+        encoded by this instance in all threads. This only speeds up encoding
+        where threads run in parallel, e.g. on free-threaded CPython.
+        Hashids are yielded in input order.
+
+        :param values_iterable An iterable of value tuples
+        :param threads The number of threads, defaults to the number of CPUs
+        :param chunk_size The number of tuples encoded at a time
+        :param executor A `concurrent.futures.ThreadPoolExecutor` to use
+                        instead of a new one, e.g. one that lives as long as
+                        the application
+        """
+        return self._in_thread_pool(_encode_list, values_iterable, threads,
+                                    chunk_size, executor)
+
+    def decode_threaded(self, hashids, threads=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+        """Like `decode_many`, but spreads the work over a pool of threads.
+        See `encode_threaded` for the parameters.
+
+        :param hashids An iterable of hashids
+        """
+        return self._in_thread_pool(_decode_list, hashids, threads,
+                                    chunk_size, executor)
+
+    def _in_thread_pool(self, func, iterable, threads, chunk_size, executor):
+        """Maps `func` over this instance and chunks of `iterable` in
+        `executor`, or in a new thread pool."""
+        threads = threads or cpu_count()
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(threads) as executor:
+                for result in self._in_thread_pool(func, iterable, threads,
+                                                   chunk_size, executor):
+                    yield result
+            return
+
+        for result in _map_chunks(executor, partial(func, self),
+                                  _chunks(iterable, chunk_size),
+                                  2 * threads):
+            yield result
+
+    def _in_process_pool(self, func, iterable, processes, chunk_size):
+        """Maps `func` over chunks of `iterable` in a new process pool whose
+        workers are initialized with the configuration of this instance."""
+        from concurrent.futures import ProcessPoolExecutor
+        processes = processes or cpu_count()
+        with ProcessPoolExecutor(processes, initializer=_init_worker,
+                                 initargs=(self._config,)) as executor:
+            for result in _map_chunks(executor, func,
+                                      _chunks(iterable, chunk_size),
+                                      2 * processes):
+                yield result
+
+    def encode_async(self, values_iterable, chunk_size=DEFAULT_CHUNK_SIZE,
+                     executor=None):
+        """Like `encode_many`, but returns an asynchronous iterator that
+        does not block the event loop for longer than one chunk.
+
+        `values_iterable` may be an iterable or an asynchronous iterable of
+        value tuples. They are encoded in chunks of `chunk_size`, each in its
+        own iteration of the event loop, or in `executor` (e.g. a
+        `concurrent.futures.ThreadPoolExecutor`) if given.
+
+        :param values_iterable An iterable or async iterable of value tuples
+        :param chunk_size The number of tuples encoded at a time
+        :param executor An executor to encode chunks in
+
+        >>> async for hashid in hashids.encode_async(rows):  # doctest: +SKIP
+        ...     await response.write(hashid)
+        """
+        return _AsyncChunks(partial(_encode_list, self), values_iterable,
+                            chunk_size, executor)
+
+    def decode_async(self, hashids, chunk_size=DEFAULT_CHUNK_SIZE,
+                     executor=None):
+        """Like `decode_many`, but returns an asynchronous iterator that
+        does not block the event loop for longer than one chunk. See
+        `encode_async` for the parameters.
+
+        :param hashids An iterable or async iterable of hashids
+        """
+        return _AsyncChunks(partial(_decode_list, self), hashids, chunk_size,
+                            executor)
+
+    def encode_array(self, values):
+        """Builds a hashid for each single unsigned 64 bit integer in
+        `values`.
+
+        With NumPy installed, `values` is converted to a uint64 array and
+        encoded with vectorized arithmetic, and an array of strings is
+        returned, with guards and padding added to whole groups of hashids at
+        once. Without NumPy, a list of strings is returned. Entries that are
+        negative, fractional or not below 2**64 produce empty strings.
+
+        :param values A sequence of integers to encode one by one
+
+        >>> hashids = Hashids()
+        >>> hashids.encode_array([1, 22, 333, -1]).tolist()
+        ['jR', 'Lw', 'Z0E', '']
+        """
+        if _import_numpy() is None:
+            return [self.encode(int(value)) if _is_uint64(value) else ''
+                    for value in values]
+
+        array = numpy.asarray(values).ravel()
+        if array.dtype.kind == 'f' and not isinstance(values, numpy.ndarray):
+            # Python integers of more than 63 bits would lose precision
+            array = numpy.asarray(values, dtype=object).ravel()
+        values, kind = array, array.dtype.kind
+        if kind == 'u':
+            valid = None
+        elif kind in 'bi':
+            valid = values >= 0
+        elif kind == 'f':
+            valid = ((values >= 0) & (values < 2.0 ** 64) &
+                     (values == numpy.floor(values)))
+        else:
+            valid = numpy.array([_is_uint64(value) for value in values],
+                                dtype=bool)
+            values = numpy.array([int(value) if is_valid else 0
+                                  for value, is_valid in zip(values, valid)],
+                                 dtype=numpy.uint64)
+
+        encoded = _encode_uint64(
+            (values if valid is None else values[valid]).astype(numpy.uint64),
+            self._salt, self._min_length, self._alphabet, self._guards,
+            self._alphabet_cache)
+        if valid is None:
+            return encoded
+        result = numpy.zeros(len(values), dtype=encoded.dtype)
+        result[valid] = encoded
+        return result
+
+    def decode_array(self, hashids):
+        """Restores a single unsigned 64 bit integer from each hashid in
+        `hashids`.
+
+        Returns the values and, for every hashid, whether it was valid. Values
+        of invalid hashids, including hashids of several or larger values, are
+        0. With NumPy installed, both are arrays (uint64 and bool), otherwise
+        lists.
+
+        :param hashids A sequence of hashids to decode
+
+        >>> hashids = Hashids()
+        >>> values, valid = hashids.decode_array(['jR', 'Lw', 'xyz'])
+        >>> values.tolist(), valid.tolist()
+        ([1, 22, 0], [True, True, False])
+        """
+        if _import_numpy() is None:
+            values, valid = [], []
+            for numbers in self.decode_many(hashids):
+                is_valid = len(numbers) == 1 and numbers[0] < 2 ** 64
+                values.append(numbers[0] if is_valid else 0)
+                valid.append(is_valid)
+            return values, valid
+
+        return _decode_uint64(numpy.asarray(hashids).ravel(), self._salt,
+                              self._min_length, self._alphabet, self._guards,
+                              self._alphabet_cache)
+
+    def encode_columns(self, values, large_offsets=False):
+        """Builds a hashid for each single unsigned 64 bit integer in
+        `values` and returns them in the layout of Arrow string arrays:
+        `(data, offsets)`, where `data` are the UTF-8 encoded hashids back to
+        back, and hashid `i` is `data[offsets[i]:offsets[i + 1]]`.
+
+        With NumPy installed, the hashids are encoded as by `encode_array`,
+        and the offsets are an int32 array, or int64 with `large_offsets`.
+        No string object is created per hashid. Without NumPy, the offsets
+        are an `array('i')` or `array('q')`. Raises ValueError if the data do
+        not fit into int32 offsets.
+
+        :param values A sequence of integers to encode one by one
+        :param large_offsets Whether to use int64 offsets, as in Arrow's
+                             `large_string` type
+
+        >>> data, offsets = Hashids().encode_columns([1, 22, 333])
+        >>> data, offsets.tolist()
+        (b'jRLwZ0E', [0, 2, 4, 7])
+        """
+        if _import_numpy() is None:
+            data = bytearray()
+            offsets = array('q' if large_offsets else 'i', [0])
+            for hashid in self.encode_array(values):
+                data += _utf8(hashid)
+                offsets.append(len(data))
+            return bytes(data), offsets
+
+        offset_type = numpy.int64 if large_offsets else numpy.int32
+        return _to_columns(self.encode_array(values), offset_type)
+
+    def decode_columns(self, data, offsets):
+        """Restores a single unsigned 64 bit integer from each hashid in the
+        layout of Arrow string arrays, as returned by `encode_columns`.
+        Returns the values and validity like `decode_array`.
+
+        :param data A bytes-like object with the UTF-8 encoded hashids
+        :param offsets A sequence of `len(hashids) + 1` offsets into `data`
+
+        >>> values, valid = Hashids().decode_columns(b'jRLwxyz', [0, 2, 4, 7])
+        >>> values.tolist(), valid.tolist()
+        ([1, 22, 0], [True, True, False])
+        """
+        if _import_numpy() is None:
+            data = memoryview(data)
+            return self.decode_array(
+                data[start:end].tobytes().decode('utf-8', 'replace')
+                for start, end in zip(offsets, islice(offsets, 1, None)))
+
+        max_length = max(len(_hash(2 ** 64 - 1, self._alphabet)) + 1,
+                         self._min_length)
+        max_char_length = max(len(_utf8(x)) for x in
+                              self._alphabet + self._separators + self._guards)
+        return self.decode_array(
+            _from_columns(data, offsets, max_length * max_char_length))
+
+    def encode_into(self, buffer, offset, *values):
+        """Builds a hashid from the passed `values` and writes it UTF-8
+        encoded (ASCII with the default alphabet) into `buffer` at `offset`.
+        Returns the number of bytes written, 0 if the values cannot be
+        encoded.
+
+        Raises ValueError without writing anything if the hashid does not fit
+        into the buffer.
+
+        :param buffer A writable bytes-like object, e.g. bytearray or
+                      memoryview
+        :param offset The position in `buffer` to write the hashid at
+        :param values The values to transform
+
+        >>> frame = bytearray(8)
+        >>> Hashids().encode_into(frame, 2, 1, 2, 3), frame
+        (6, bytearray(b'\\x00\\x00o2fXhV'))
+        """
+        data = _utf8(self.encode(*values))
+        end = offset + len(data)
+        if offset < 0 or end > len(buffer):
+            raise ValueError('The hashid does not fit into the buffer.')
+        buffer[offset:end] = data
+        return len(data)
+
+    def decode_into(self, buffer, out, offset=0, length=None, out_offset=0):
+        """Restores the numbers of the UTF-8 encoded hashid in `length` bytes
+        of `buffer` at `offset` and writes them into `out` at `out_offset`.
+        Returns the number of values written, 0 for invalid hashids.
+
+        Raises ValueError without writing anything if `offset` or `length` is
+        negative, or if the numbers do not fit into `out`. Assigning numbers
+        that `out` cannot hold raises the error of `out`, e.g. OverflowError
+        for `array('Q')`.
+
+        :param buffer A bytes-like object, e.g. bytes or memoryview
+        :param out A preallocated sequence of integers, e.g. `array('Q')` or
+                   a NumPy array
+        :param offset The position of the hashid in `buffer`
+        :param length The length of the hashid, defaults to the rest of
+                      `buffer`
+        :param out_offset The position in `out` to write the numbers at
+
+        >>> out = array('Q', [0] * 4)
+        >>> Hashids().decode_into(b'id=o2fXhV', out, 3), out
+        (3, array('Q', [1, 2, 3, 0]))
+        """
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError('The hashid is not inside the buffer.')
+        data = memoryview(buffer)[offset:]
+        if length is not None:
+            data = data[:length]
+        try:
+            hashid = data.tobytes().decode('utf-8')
+        except UnicodeDecodeError:
+            return 0
+
+        numbers = self.decode(hashid)
+        if out_offset < 0 or out_offset + len(numbers) > len(out):
+            raise ValueError('The numbers do not fit into the output array.')
+        for i, number in enumerate(numbers, out_offset):
+            out[i] = number
+        return len(numbers)
+
+    def scan(self, source, chunk_size=IO_BUFFER_SIZE):
+        """Finds the hashids of this instance in `source` and yields
+        `(offset, hashid, values)` for each, in order of occurrence.
+
+        Candidates are the longest runs of characters that can occur in
+        hashids. Runs without the structure of a hashid are skipped by a
+        regular expression, and runs whose first value does not match its
+        lottery character or the following separator are rejected without
+        decoding them. All others are decoded.
+
+        Text and files opened in text mode are scanned for characters, and
+        offsets count characters. Bytes-like objects, including memory maps,
+        and binary files are scanned for UTF-8 encoded characters, and
+        offsets count bytes.
+
+        Files are read in chunks of `chunk_size`, and a run at the end of a
+        chunk is carried over to the next one. Runs of `chunk_size` or more
+        bytes or characters are skipped, so memory use stays bounded. Memory
+        maps are searched in place, like other bytes-like objects, without
+        reading them.
+
+        :param source A string, bytes-like object, memory map or file object
+        :param chunk_size The number of bytes or characters read at a time
+
+        >>> text = 'GET /orders/o2fXhV?ref=jR HTTP/1.1'
+        >>> list(Hashids().scan(text))
+        [(12, 'o2fXhV', (1, 2, 3)), (23, 'jR', (1,))]
+        """
+        read = (None if isinstance(source, mmap.mmap) else
+                getattr(source, 'read', None))
+        if read is None:
+            chunks, chunk_size = [source], len(source) + 1
+        else:
+            chunks = iter(lambda: read(chunk_size), None)
+
+        alphabet, separators, guards = (self._alphabet, self._separators,
+                                        self._guards)
+        charset = alphabet + separators + guards
+        patterns = (_token_pattern(alphabet, separators, guards, True),
+                    _token_pattern(alphabet, separators, guards))
+        strip_chars = (b''.join(_utf8(x) for x in charset), charset)
+        multibyte = set(x for x in charset if len(_utf8(x)) > 1)
+        screen = _screen(self)
+
+        carry, skipping, offset = None, False, 0
+        for chunk in chunks:
+            final = read is None or not chunk
+            if carry:
+                chunk = carry + chunk
+            if not chunk:
+                break
+            is_text = _is_str(chunk)
+            chars = strip_chars[is_text]
+            start = len(chunk) - len(chunk.lstrip(chars)) if skipping else 0
+            stop, carry, skipping = len(chunk), None, False
+            if not final:
+                stop = len(chunk.rstrip(chars))
+                if stop < start or len(chunk) - stop >= chunk_size:
+                    stop, skipping = max(stop, start), True
+                else:
+                    carry = chunk[stop:]
+
+            for match in patterns[is_text].finditer(chunk, start, stop):
+                hashid = match.group()
+                if len(hashid) >= chunk_size:
+                    continue
+                if not is_text:
+                    if (multibyte and _preceding_character(
+                            chunk, match.start()) in multibyte):
+                        continue  # the run starts before the match
+                    hashid = hashid.decode('utf-8')
+                if _may_match(hashid, self, charset, *screen):
+                    values = self.decode(hashid)
+                    if values:
+                        yield offset + match.start(), hashid, values
+            offset += len(chunk) - len(carry or chunk[:0])
+            if final:
+                break
+
     def encode_hex(self, hex_str):
         """Converts a hexadecimal string (e.g. a MongoDB id) to a hashid.
 
@@ -271,3 +1940,496 @@ class Hashids(object):
         '507f1f77bcf86cd799439011'
         """
         return ''.join(('%x' % x)[1:] for x in self.decode(hashid))
+
+    def encode_bytes(self, data):
+        """Converts binary data (e.g. a raw MongoDB id) to a hashid.
+
+        Produces the same hashid as passing the hexadecimal representation of
+        `data` to `encode_hex`, without building that representation.
+
+        :param data A bytes-like object, e.g. bytes or memoryview
+
+        >>> Hashids().encode_bytes(bytes.fromhex('507f1f77bcf86cd799439011'))
+        'y42LW46J9luq3Xq9XMly'
+        """
+        data = memoryview(data)
+        numbers = []
+        for i in range(0, len(data), 6):
+            chunk = data[i:i+6]
+            numbers.append((1 << 8 * len(chunk)) |
+                           _int_from_bytes(chunk, 'big'))
+        return self.encode(*numbers)
+
+    def decode_bytes(self, hashid):
+        """Restores binary data from a hashid created with `encode_bytes`.
+
+        Returns empty bytes for hashids that do not represent whole bytes.
+
+        :param hashid The hashid to decode
+
+        >>> Hashids().decode_bytes('y42LW46J9luq3Xq9XMly').hex()
+        '507f1f77bcf86cd799439011'
+        """
+        chunks = []
+        for number in self.decode(hashid):
+            length, bits = divmod(number.bit_length() - 1, 8)
+            if bits or length < 1:
+                return b''
+            chunks.append(_int_to_bytes(number ^ (1 << 8 * length), length))
+        return b''.join(chunks)
+
+    def encode_uuid(self, uuid):
+        """Converts a `uuid.UUID` to a hashid. Equivalent to calling
+        `encode_hex` with its 32 digit hexadecimal representation.
+
+        :param uuid The UUID to encode
+        """
+        return self.encode_bytes(uuid.bytes)
+
+    def decode_uuid(self, hashid):
+        """Restores a `uuid.UUID` from a hashid created with `encode_uuid`.
+        Returns None for other hashids.
+
+        :param hashid The hashid to decode
+        """
+        data = self.decode_bytes(hashid)
+        return UUID(bytes=data) if len(data) == 16 else None
+
+
+class HashidsKeyring(object):
+    """Decodes hashids created with any of several Hashids instances, e.g.
+    while rotating salts. The first instance is the primary one, used for
+    encoding and tried first when decoding.
+
+    Instances are ruled out without decoding where possible. An index from
+    each character to the instances whose character set, guards and
+    alphabet contain it selects the candidates: instances whose guards occur
+    in the hashid must have padded it to their minimum length, the others
+    must have its first character as lottery character. For each candidate,
+    the guards are located, and the first value between them is checked
+    against the lottery character, or against the separator that follows
+    it. The alphabets needed for that are computed once per instance. Only
+    the remaining instances decode the hashid.
+    """
+
+    def __init__(self, hashids):
+        """
+        :param hashids: The Hashids instances, the primary one first.
+        """
+        self._members = tuple(hashids)
+        if not self._members:
+            raise ValueError('A keyring needs at least one Hashids instance.')
+
+        # Bit i of each mask stands for member i. In the mask of a character
+        # it is set if member i does not use the character, and bit
+        # count + i is set if the character is one of its guards.
+        count = len(self._members)
+        self._all = (1 << count) - 1
+        self._masks, self._lottery_masks, self._length_masks = {}, {}, {}
+        self._screens = []
+        for i, member in enumerate(self._members):
+            bit = 1 << i
+            charset = member._alphabet + member._separators + member._guards
+            for char in set(charset):
+                self._masks.setdefault(char, self._all)
+                self._masks[char] &= ~bit
+            for char in set(member._guards):
+                self._masks[char] |= bit << count
+            for char in set(member._alphabet):
+                self._lottery_masks[char] = \
+                    self._lottery_masks.get(char, 0) | bit
+            self._length_masks[member._min_length] = \
+                self._length_masks.get(member._min_length, 0) | bit
+            self._screens.append((member, charset) + _screen(member))
+
+    @classmethod
+    def from_salts(cls, salts, min_length=0, alphabet=Hashids.ALPHABET):
+        """Builds a keyring of instances with the same `min_length` and
+        `alphabet`, one for each salt in `salts`, the primary one first."""
+        return cls(Hashids(salt, min_length, alphabet) for salt in salts)
+
+    @property
+    def members(self):
+        """The Hashids instances of this keyring, the primary one first."""
+        return self._members
+
+    def encode(self, *values):
+        """Builds a hashid from the passed `values` with the primary
+        instance."""
+        return self._members[0].encode(*values)
+
+    def decode(self, hashid):
+        """Restores a tuple of numbers from a hashid created with any of the
+        instances of this keyring."""
+        return self.match(hashid)[1]
+
+    def match(self, hashid):
+        """Returns the first instance that can decode `hashid`, together with
+        the decoded numbers, or `(None, ())`.
+
+        >>> keyring = HashidsKeyring.from_salts(['new salt', 'old salt'])
+        >>> hashids, numbers = keyring.match(Hashids('old salt').encode(1))
+        >>> hashids is keyring.members[1], numbers
+        (True, (1,))
+        """
+        if not hashid or not _is_str(hashid):
+            return None, ()
+
+        masks, everyone = self._masks, self._all
+        found = 0
+        for char in hashid:
+            found |= masks.get(char, everyone)
+        allowed, guarded = everyone & ~found, found >> len(self._members)
+        length = len(hashid)
+        padded = self._length_masks.get(length, 0)
+        unpadded = 0
+        for min_length, mask in self._length_masks.items():
+            if min_length <= length:
+                unpadded |= mask
+        candidates = allowed & ((guarded & padded) |
+                                (unpadded & ~guarded &
+                                 self._lottery_masks.get(hashid[0], 0)))
+
+        # Without guards the first value starts the hashid, so its end only
+        # depends on the set of separators, which most members share.
+        ends = {}
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            screen = self._screens[bit.bit_length() - 1]
+            member = screen[0]
+            if bit & guarded:
+                if not _may_match(hashid, *screen):
+                    continue
+            else:
+                separator_pattern = screen[4]
+                end = ends.get(separator_pattern.pattern)
+                if end is None:
+                    separator = separator_pattern.search(hashid, 1)
+                    end = ends[separator_pattern.pattern] = \
+                        separator.start() if separator else length
+                if not _first_value_may_match(hashid, member, screen[3], 0,
+                                              end, length):
+                    continue
+            try:
+                numbers = _decode(hashid, member._salt, member._min_length,
+                                  member._alphabet, member._separators,
+                                  member._guards, member._alphabet_cache)
+            except ValueError:
+                continue
+            if numbers:
+                return member, numbers
+        return None, ()
+
+
+def _screen(hashids):
+    """Returns the guard pattern, the alphabets of the first value for each
+    lottery character, and the separator pattern of `hashids`, as needed by
+    `_may_match`."""
+    first_alphabets = dict(
+        (lottery, _chained_alphabet(hashids._alphabet, lottery,
+                                    hashids._salt, 0, hashids._alphabet_cache))
+        for lottery in hashids._alphabet)
+    return (_character_pattern(hashids._guards), first_alphabets,
+            _character_pattern(sorted(hashids._separators)))
+
+
+def _may_match(hashid, hashids, charset, guard_pattern, first_alphabets,
+               separator_pattern):
+    """Returns False if `hashids` certainly cannot decode `hashid`, which
+    must only contain characters of `charset`.
+
+    The guards of `hashids` are located to find the part of the hashid
+    between guards and padding. The first value in that part is checked
+    against the lottery character, or against the separator that follows
+    it."""
+    guard = guard_pattern.search(hashid)
+    if guard is None:
+        if len(hashid) < hashids._min_length:
+            return False
+        start, stop = 0, len(hashid)
+    else:
+        if len(hashid) != hashids._min_length:
+            return False
+        start = guard.end()
+        guard = guard_pattern.search(hashid, start)
+        if guard is None:
+            stop = len(hashid)
+        elif guard_pattern.search(hashid, guard.end()) is None:
+            stop = guard.start()
+        else:
+            return False
+
+    separator = separator_pattern.search(hashid, start + 1, stop)
+    end = separator.start() if separator else stop
+    return _first_value_may_match(hashid, hashids, first_alphabets, start, end,
+                                  stop)
+
+
+def _first_value_may_match(hashid, hashids, first_alphabets, start, end,
+                           stop):
+    """Returns False if the first value of `hashid`, between `start` and
+    `end`, cannot have been encoded by `hashids`, given the lottery character
+    at `start` or the separator at `end`, before `stop`."""
+    if stop - start < 2 or hashid[start] not in first_alphabets:
+        return False
+    lottery = hashid[start]
+    alphabet, alphabet_index = first_alphabets[lottery]
+    part = hashid[start + 1:end]
+    if not part or (len(part) > 1 and part[0] == alphabet[0]):
+        return False
+    try:
+        value = _unhash(part, alphabet_index)
+    except ValueError:
+        return False
+
+    if end == stop:
+        base_alphabet = hashids._alphabet
+        return lottery == base_alphabet[value % 100 % len(base_alphabet)]
+    separators = hashids._separators
+    return hashid[end] == separators[value % ord(part[0]) % len(separators)]
+
+
+_TABLE_MAGIC = b'HASHIDS\x01'
+_TABLE_HEADER = struct.Struct('<8sIQQI')
+_unpack_uint32 = struct.Struct('<I').unpack_from
+
+
+def _utf8(string):
+    """Returns `string` as UTF-8 encoded byte string."""
+    return string if isinstance(string, bytes) else string.encode('utf-8')
+
+
+def _aligned(offset, alignment=8):
+    """Rounds `offset` up to a multiple of `alignment`."""
+    return -(-offset // alignment) * alignment
+
+
+def _uint32_array(size):
+    """Returns a zero-filled array of `size` unsigned 32 bit integers."""
+    typecode = 'I' if array('I').itemsize == 4 else 'L'
+    return array(typecode, bytes(bytearray(4 * size)))
+
+
+class HashidsTable(object):
+    """A read-only lookup table of the hashids of the single values
+    `0 <= value < bound`, stored in a file and opened as a memory map, so that
+    processes opening the same file share it through the page cache.
+
+    The file contains the hashids as fixed-width, NUL-padded UTF-8 strings,
+    ordered by value, followed by an open addressing hash index of the
+    hashids. Anything not in the table is passed to the Hashids instance.
+    """
+
+    def __init__(self, path, hashids):
+        """Opens the table at `path`.
+
+        :param path: The path of a file written by `HashidsTable.build`
+        :param hashids: The Hashids instance the table was built with. Raises
+                        ValueError if the table was built with a different
+                        configuration.
+        """
+        with open(path, 'rb') as table_file:
+            self._map = mmap.mmap(table_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        try:
+            magic, width, count, slots, len_config = \
+                _TABLE_HEADER.unpack_from(self._map)
+            config_end = _TABLE_HEADER.size + len_config
+            config = json.loads(
+                self._map[_TABLE_HEADER.size:config_end].decode('utf-8'))
+        except (struct.error, ValueError):
+            magic = config = None
+        if magic != _TABLE_MAGIC:
+            self.close()
+            raise ValueError('%s is not a hashids table' % path)
+        if config != list(hashids._config[:3]):
+            self.close()
+            raise ValueError('%s was built for a different configuration' %
+                             path)
+
+        self._hashids = hashids
+        self._width, self._count, self._mask = width, count, slots - 1
+        self._data = _aligned(config_end)
+        self._index = _aligned(self._data + count * width)
+        self._text = not isinstance(hashids._alphabet, bytes)
+
+    @classmethod
+    def build(cls, hashids, path, bound=DEFAULT_TABLE_BOUND):
+        """Writes a table of the hashids of `0 <= value < bound` to `path` and
+        opens it. The file is written next to `path` and then moved into
+        place, so that processes never open a partially written table.
+
+        :param hashids: The Hashids instance to build the table for
+        :param path: The path of the table file
+        :param bound: The number of values in the table
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'hashids.table')
+        >>> table = HashidsTable.build(Hashids(), path, 1000)
+        >>> table.encode(123), table.decode('Mj3')
+        ('Mj3', (123,))
+        """
+        bound = int(bound)
+        if not 0 < bound < 1 << 32:
+            raise ValueError('bound must be between 1 and 2**32 - 1')
+
+        encode = hashids.compile(1)[0]
+        charset = hashids._alphabet + hashids._separators + hashids._guards
+        if u'\0' in charset:
+            raise ValueError('Alphabets containing NUL cannot be stored in a '
+                             'table.')
+        width = len(encode(bound - 1)) * max(len(_utf8(x)) for x in charset)
+        slots = 1 << (2 * bound - 1).bit_length()
+        config = json.dumps(hashids._config[:3]).encode('utf-8')
+
+        mask, index = slots - 1, _uint32_array(slots)
+        partial_path = '%s.%d.partial' % (path, os.getpid())
+        with open(partial_path, 'wb') as table_file:
+            table_file.write(_TABLE_HEADER.pack(_TABLE_MAGIC, width, bound,
+                                                slots, len(config)))
+            table_file.write(config)
+            table_file.write(b'\0' * (_aligned(table_file.tell()) -
+                                      table_file.tell()))
+            for start in _range(0, bound, DEFAULT_CHUNK_SIZE):
+                stop = min(start + DEFAULT_CHUNK_SIZE, bound)
+                chunk = []
+                for value in _range(start, stop):
+                    hashid = _utf8(encode(value))
+                    slot = crc32(hashid) & mask
+                    while index[slot]:
+                        slot = (slot + 1) & mask
+                    index[slot] = value + 1
+                    chunk.append(hashid.ljust(width, b'\0'))
+                table_file.write(b''.join(chunk))
+            table_file.write(b'\0' * (_aligned(table_file.tell()) -
+                                      table_file.tell()))
+            if sys.byteorder != 'little':
+                index.byteswap()
+            table_file.write(index.tostring() if str is bytes
+                             else index.tobytes())
+        getattr(os, 'replace', os.rename)(partial_path, path)
+        return cls(path, hashids)
+
+    @property
+    def bound(self):
+        """The number of values in the table."""
+        return self._count
+
+    def encode(self, *values):
+        """Builds a hashid from the passed `values`, from the table for single
+        values below the bound."""
+        if len(values) == 1:
+            value = values[0]
+            if isinstance(value, _INT_TYPES) and 0 <= value < self._count:
+                offset = self._data + int(value) * self._width
+                hashid = self._map[offset:offset + self._width].rstrip(b'\0')
+                return hashid.decode('utf-8') if self._text else hashid
+        return self._hashids.encode(*values)
+
+    def decode(self, hashid):
+        """Restores a tuple of numbers from the passed `hashid`, from the
+        table if it is the hashid of a single value below the bound."""
+        if hashid and _is_str(hashid):
+            key = _utf8(hashid)
+            width = self._width
+            if len(key) <= width and b'\0' not in key:
+                padded = key.ljust(width, b'\0')
+                table, data, index = self._map, self._data, self._index
+                mask, slot = self._mask, crc32(key) & self._mask
+                while True:
+                    value = _unpack_uint32(table, index + 4 * slot)[0]
+                    if not value:
+                        break
+                    offset = data + (value - 1) * width
+                    if table[offset:offset + width] == padded:
+                        return (value - 1,)
+                    slot = (slot + 1) & mask
+        return self._hashids.decode(hashid)
+
+    def close(self):
+        """Closes the memory map."""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _parse_values(line):
+    """Parses a line of comma-separated integers, returning an empty tuple for
+    malformed lines."""
+    try:
+        return tuple(int(x) for x in line.split(','))
+    except ValueError:
+        return ()
+
+
+def _reopen(stream, mode):
+    """Opens the file descriptor of `stream` (stdin or stdout) again in text
+    `mode`, with a buffer of `IO_BUFFER_SIZE` bytes. Closing the returned
+    file leaves the descriptor open. Returns `stream` itself if it has no
+    file descriptor, e.g. when it was replaced."""
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, ValueError):
+        return stream
+    return io.open(fileno, mode, encoding='utf-8', buffering=IO_BUFFER_SIZE,
+                   closefd=False)
+
+
+def _main(argv=None):
+    """Command line interface converting newline-delimited input."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m hashids',
+        description='Converts newline-delimited values to hashids and back. '
+                    'Values are integers, comma-separated integers, or '
+                    'hexadecimal strings for the hex commands. Lines that '
+                    'cannot be converted produce empty lines.')
+    parser.add_argument('command', choices=('encode', 'decode', 'encode-hex',
+                                            'decode-hex'))
+    parser.add_argument('file', nargs='?', default='-',
+                        help='the input file, defaults to stdin')
+    parser.add_argument('-s', '--salt', default='')
+    parser.add_argument('-l', '--min-length', type=int, default=0)
+    parser.add_argument('-a', '--alphabet', default=Hashids.ALPHABET)
+    parse_args = getattr(parser, 'parse_intermixed_args', parser.parse_args)
+    args = parse_args(argv)
+
+    hashids = Hashids(args.salt, args.min_length, args.alphabet)
+    if args.file == '-':
+        infile = _reopen(sys.stdin, 'r')
+    else:
+        infile = io.open(args.file, encoding='utf-8', buffering=IO_BUFFER_SIZE)
+    sys.stdout.flush()
+    outfile = _reopen(sys.stdout, 'w')
+
+    lines = (line.strip() for line in infile)
+    if args.command == 'encode':
+        results = hashids.encode_many(_parse_values(x) for x in lines)
+    elif args.command == 'decode':
+        results = (','.join(str(x) for x in values)
+                   for values in hashids.decode_many(lines))
+    elif args.command == 'encode-hex':
+        results = (hashids.encode_hex(x) for x in lines)
+    else:
+        results = (hashids.decode_hex(x) for x in lines)
+
+    write = outfile.write
+    try:
+        for chunk in _chunks(results, DEFAULT_CHUNK_SIZE):
+            chunk.append('')
+            write('\n'.join(chunk))
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    _main()
@@ -1,3 +1,15 @@
+import io
+import mmap
+import os
+import pickle
+import subprocess
+import sys
+from array import array
+from itertools import product
+from threading import Thread
+from uuid import UUID
+
+import hashids
 from hashids import Hashids
 import pytest
 
@@ -9,6 +21,227 @@ class TestConstructor(object):
     def test_small_alphabet_with_repeating_characters(self):
         pytest.raises(ValueError, Hashids, alphabet='abcdecfghijklbmnoa')
 
+    def test_immutable(self):
+        h = Hashids('salt')
+        pytest.raises(AttributeError, setattr, h, '_salt', 'other')
+        pytest.raises(AttributeError, setattr, h, 'foo', 1)
+        pytest.raises(AttributeError, delattr, h, '_salt')
+
+    def test_shared_tables(self):
+        once = Hashids('shared')
+        a, b = Hashids('shared', 0), Hashids('shared', 8)
+        assert a._alphabet_cache is b._alphabet_cache
+        assert a._structure is b._structure
+        assert once._alphabet_cache is not a._alphabet_cache
+        assert Hashids('other')._alphabet_cache is not a._alphabet_cache
+
+    def test_alphabet_beyond_latin1(self):
+        h = Hashids('salt', 10, u'\u03b1\u03b2\u03b3\u03b4\u03b5\u03b6\u03b7'
+                                u'\u03b8\u03b9\u03ba\u03bb\u03bc\u03bd\u03be'
+                                u'\u03bf\u03c0\u03c1\u03c3\u03c4\u03c5')
+        hashid = h.encode(1, 2, 3)
+        assert h.decode(hashid) == (1, 2, 3)
+        assert h.decode(hashid + u'a') == ()
+
+    def test_alphabet_sequence(self):
+        alphabet = 'abcdefghijklmnopqrstuvwxyz'
+        h = Hashids('salt', alphabet=list(alphabet))
+        expected = Hashids('salt', alphabet=alphabet).encode(1, 2, 3)
+        assert h.encode(1, 2, 3) == expected
+        assert h._config[2] == alphabet
+
+    def test_pickle(self):
+        h = Hashids('salt', 8, 'abcdefghijklmnopqrstuvwxyz',
+                    result_cache_size=10, stats=hashids.HashidsStats())
+        h.encode(1)
+        restored = pickle.loads(pickle.dumps(h))
+        assert restored._config == h._config
+        assert restored._stats is None
+        assert restored.encode(1, 2, 3) == h.encode(1, 2, 3)
+        assert restored.decode(h.encode(1, 2, 3)) == (1, 2, 3)
+
+
+class TestAlphabetCache(object):
+    def test_cached_results_match_uncached(self):
+        cached, uncached = Hashids('salt'), Hashids('salt', cache_size=0)
+        for values in [(1,), (1, 2, 3), (683, 94108, 123, 5), (1,), (1, 2, 3)]:
+            hashid = uncached.encode(*values)
+            assert cached.encode(*values) == hashid
+            assert cached.decode(hashid) == values
+
+    def test_cache_is_bounded(self):
+        h = Hashids(cache_size=4)
+        for i in range(100):
+            h.decode(h.encode(i, i, i))
+        first = h._alphabet_cache.first
+        assert 0 < len(first) <= len(h._alphabet)
+        assert len(h._alphabet_cache) == len(first) + 4
+
+    def test_first_alphabets(self):
+        h = Hashids('first')
+        h.encode(1)
+        lottery = h.encode(1)[0]
+        assert list(h._alphabet_cache.first) == [lottery]
+        assert len(h._alphabet_cache._lru) == 0
+
+    def test_disabled_cache(self):
+        h = Hashids(cache_size=0)
+        assert h.encode(1, 2, 3) == 'o2fXhV'
+        assert len(h._alphabet_cache) == 0
+
+    def test_sharded(self):
+        cache = hashids._lru_cache(1024, 16)
+        assert isinstance(cache, hashids._ShardedLRUCache)
+        for i in range(2000):
+            cache.set(i, i)
+            assert cache.get(i) == i
+        assert cache.get('missing') is None
+        info = cache.info()
+        assert (info.hits, info.misses, info.maxsize) == (2000, 1, 1024)
+        assert info.currsize == len(cache) <= 1024
+        assert info.evictions == 2000 - info.currsize
+        assert isinstance(hashids._lru_cache(1024), hashids._LRUCache)
+        assert isinstance(hashids._lru_cache(64, 16), hashids._LRUCache)
+
+    def test_cache_shards(self):
+        h = Hashids('shards', cache_shards=4, result_cache_size=1024)
+        assert isinstance(h._alphabet_cache._lru, hashids._ShardedLRUCache)
+        assert isinstance(h._result_cache, hashids._ShardedLRUCache)
+        assert h.decode(h.encode(1, 2, 3)) == (1, 2, 3)
+        assert h.cache_info().currsize == 2
+        assert isinstance(Hashids('shards')._alphabet_cache._lru,
+                          hashids._LRUCache)
+        assert Hashids('shards')._result_cache is None
+
+
+class TestPadding(object):
+    def naive_ensure_length(self, encoded, min_length, alphabet):
+        split_at = len(alphabet) // 2
+        while len(encoded) < min_length:
+            alphabet = hashids._reorder(alphabet, alphabet)
+            encoded = alphabet[split_at:] + encoded + alphabet[:split_at]
+            excess = len(encoded) - min_length
+            if excess > 0:
+                from_index = excess // 2
+                encoded = encoded[from_index:from_index+min_length]
+        return encoded
+
+    def test_padding_matches_wrapping(self):
+        for alphabet in ['abcdefghijklmnopqrstuvwxyz', 'abcdefghijklmnopq']:
+            for length in range(2, 30):
+                for min_length in range(length, 80):
+                    left, right = hashids._padding(alphabet, length,
+                                                   min_length)
+                    assert left + '#' * length + right == \
+                        self.naive_ensure_length('#' * length, min_length,
+                                                 alphabet)
+
+
+class TestResultCache(object):
+    def test_disabled_by_default(self):
+        h = Hashids()
+        h.decode('jR')
+        assert h.cache_info() == (0, 0, 0, 0, 0)
+
+    def test_decode(self):
+        h = Hashids(result_cache_size=10)
+        assert h.decode('jR') == (1,)
+        assert h.decode('jR') == (1,)
+        assert h.cache_info() == (1, 1, 0, 10, 1)
+
+    def test_negative_results(self):
+        h = Hashids(result_cache_size=10)
+        assert h.decode('xyz') == ()
+        assert h.decode('xyz') == ()
+        assert h.cache_info().hits == 1
+
+    def test_encode(self):
+        h = Hashids(result_cache_size=10)
+        assert h.encode(1, 2, 3) == 'o2fXhV'
+        assert h.encode(1, 2, 3) == 'o2fXhV'
+        assert h.cache_info().hits == 1
+
+    def test_encode_non_int(self):
+        h = Hashids(result_cache_size=10)
+        assert h.encode(1) == 'jR'
+        pytest.raises(TypeError, h.encode, 1.0)
+        assert h.cache_info().currsize == 1
+
+    def test_eviction(self):
+        h = Hashids(result_cache_size=2)
+        for hashid in ['jR', 'Lw', 'Z0E', 'jR']:
+            h.decode(hashid)
+        assert h.cache_info() == (0, 4, 2, 2, 2)
+
+    def test_threads(self):
+        h = Hashids(result_cache_size=50)
+        hashids = [h.encode(i) for i in range(100)]
+
+        def decode_all():
+            for i, hashid in enumerate(hashids * 10):
+                assert h.decode(hashid) == (i % 100,)
+
+        threads = [Thread(target=decode_all) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = h.cache_info()
+        assert info.hits + info.misses == 4100
+        assert info.currsize == 50
+
+
+class TestStats(object):
+    def test_encode(self):
+        stats = hashids.HashidsStats()
+        h = Hashids(min_length=8, stats=stats)
+        assert h.encode(1, 2, 3) == Hashids(min_length=8).encode(1, 2, 3)
+        assert h.encode(1 << 70) == Hashids(min_length=8).encode(1 << 70)
+        snapshot = stats.snapshot()
+        assert snapshot['encode_calls'] == 2
+        assert snapshot['padding_calls'] == 1
+        assert snapshot['encode_time'] >= snapshot['padding_time'] > 0
+        assert snapshot['value_bits'] == {8: 3, 128: 1}
+
+    def test_encode_invalid(self):
+        stats = hashids.HashidsStats()
+        h = Hashids(stats=stats)
+        assert h.encode() == ''
+        assert h.encode(-1) == ''
+        snapshot = stats.snapshot()
+        assert snapshot['encode_calls'] == 2
+        assert snapshot['encode_time'] > 0
+        assert snapshot['value_bits'] == {}
+
+    def test_decode(self):
+        stats = hashids.HashidsStats()
+        h = Hashids(stats=stats)
+        assert h.decode('o2fXhV') == (1, 2, 3)
+        snapshot = stats.snapshot()
+        assert snapshot['decode_calls'] == 1
+        assert snapshot['rejections'] == {}
+        assert snapshot['value_bits'] == {8: 3}
+
+    def test_rejections(self):
+        stats = hashids.HashidsStats()
+        h = Hashids(min_length=6, stats=stats)
+        for hashid in ['', object(), 'o2fX-V', 'jR', 'o2ffXhV', 'nQR',
+                       'o2cXhV']:
+            assert h.decode(hashid) == ()
+        assert stats.snapshot()['rejections'] == {
+            hashids.REJECTED_TYPE: 2,
+            hashids.REJECTED_CHARACTERS: 1,
+            hashids.REJECTED_LENGTH: 2,
+            hashids.REJECTED_STRUCTURE: 1,
+            hashids.REJECTED_VERIFICATION: 1,
+        }
+
+    def test_reset(self):
+        stats = hashids.HashidsStats()
+        Hashids(stats=stats).encode(1)
+        stats.reset()
+        assert stats.snapshot()['encode_calls'] == 0
+
 
 class TestEncoding(object):
     def test_empty_call(self):
@@ -97,6 +330,612 @@ class TestEncoding(object):
         assert Hashids().encode_hex('') == ''
         assert Hashids().encode_hex('1234SGT8') == ''
 
+    def test_encode_bytes(self):
+        data = b'\x50\x7f\x1f\x77\xbc\xf8\x6c\xd7\x99\x43\x90\x11'
+        assert Hashids().encode_bytes(data) == 'y42LW46J9luq3Xq9XMly'
+        assert Hashids().encode_bytes(memoryview(bytearray(data))) == \
+            'y42LW46J9luq3Xq9XMly'
+        assert Hashids().encode_bytes(b'') == ''
+
+    def test_encode_uuid(self):
+        h = Hashids(min_length=10)
+        uuid = UUID('01234567-89ab-cdef-0123-456789abcdef')
+        assert h.encode_uuid(uuid) == h.encode_hex(uuid.hex)
+
+
+class TestLargeNumbers(object):
+    def naive_hash(self, number, alphabet):
+        hashed = ''
+        while True:
+            hashed = alphabet[number % len(alphabet)] + hashed
+            number //= len(alphabet)
+            if not number:
+                return hashed
+
+    def test_hash_large(self):
+        alphabet = Hashids()._alphabet
+        for number in [hashids.LARGE_NUMBER, 7 ** 2000, 1 << 5000,
+                       (1 << 5000) - 1, len(alphabet) ** 300]:
+            assert hashids._hash(number, alphabet) == \
+                self.naive_hash(number, alphabet)
+
+    def test_round_trip(self):
+        h = Hashids('salt', 20)
+        values = (1 << 4096, 3 ** 5000 + 12345, 0, 1)
+        assert h.decode(h.encode(*values)) == values
+
+
+class TestIsValid(object):
+    def test_valid(self):
+        h = Hashids(min_length=25)
+        assert h.is_valid('pO3K69b86jzc6krI416enr2B5')
+        assert h.is_valid(h.encode(1 << 200))
+
+    def test_invalid_characters(self):
+        assert not Hashids().is_valid('o2fXh-')
+        assert not Hashids().is_valid(object())
+
+    def test_invalid_length(self):
+        h = Hashids(min_length=25)
+        assert not h.is_valid('o2fXhV')
+        assert not h.is_valid('pO3K69b86jzc6krI416enr2B5a')
+
+    def test_invalid_guards(self):
+        h = Hashids()
+        assert not h.is_valid('ao2fXhV')
+        assert not h.is_valid('ao2fXhVaba')
+
+    def test_empty_segments(self):
+        h = Hashids()
+        assert not h.is_valid('o2ffXhV')
+        assert not h.is_valid('o2fXhVf')
+        assert not h.is_valid('of2XhV')
+        assert not h.is_valid('o')
+
+
+class TestCompile(object):
+    def test_single_value(self):
+        h = Hashids(min_length=25)
+        encode, decode = h.compile()
+        assert encode(6097) == 'Nz7x3VXyMYerRmWeOBQn6LlRG'
+        assert decode('Nz7x3VXyMYerRmWeOBQn6LlRG') == (6097,)
+        assert encode(-1) == ''
+
+    def test_multiple_values(self):
+        h = Hashids('arbitrary salt', 16, 'abcdefghijklmnopqrstuvwxyz')
+        encode, decode = h.compile(arity=3)
+        assert encode(7452, 2967, 21401) == 'wygqxeunkatjgkrw'
+        assert decode('wygqxeunkatjgkrw') == (7452, 2967, 21401)
+        pytest.raises(TypeError, encode, 1, 2)
+
+    def test_wrong_arity(self):
+        h = Hashids()
+        assert h.compile()[1]('o2fXhV') == ()
+        assert h.compile(2)[1]('o2fXhV') == ()
+        assert h.compile(2)[1]('jR') == ()
+
+    def test_invalid_hashids(self):
+        decode = Hashids().compile()[1]
+        assert decode('') == ()
+        assert decode('j0g-') == ()
+        assert decode('nQR') == ()
+        assert decode('ajR') == ()
+
+    def test_invalid_arity(self):
+        pytest.raises(ValueError, Hashids().compile, 0)
+
+
+class TestEncodeRange(object):
+    def test_matches_encode(self):
+        h = Hashids('salt', 12)
+        assert list(h.encode_range(95, 1100)) == \
+            [h.encode(i) for i in range(95, 1100)]
+
+    def test_stop_only(self):
+        h = Hashids()
+        assert list(h.encode_range(3)) == ['gY', 'jR', 'k5']
+
+    def test_step(self):
+        h = Hashids()
+        start = 1 << 80
+        assert list(h.encode_range(start, start + 1000, 7)) == \
+            [h.encode(i) for i in range(start, start + 1000, 7)]
+
+    def test_empty(self):
+        assert list(Hashids().encode_range(5, 5)) == []
+
+
+class TestEncodeMany(object):
+    def test_matches_encode(self):
+        h = Hashids('arbitrary salt', 16, 'abcdefghijklmnopqrstuvwxyz')
+        values = [(7452, 2967, 21401), (1, 2, 3), (60125,), (99, 25)]
+        assert list(h.encode_many(values)) == [h.encode(*v) for v in values]
+
+    def test_invalid_values(self):
+        h = Hashids()
+        assert list(h.encode_many([(), (1, -2, 3), (1,), (2.5,)])) == \
+            ['', '', 'jR', '']
+
+    def test_is_lazy(self):
+        h = Hashids()
+        encoded = h.encode_many(iter([(1,), (22,)]))
+        assert next(encoded) == 'jR'
+        assert next(encoded) == 'Lw'
+
+
+class TestDecodeMany(object):
+    def test_matches_decode(self):
+        h = Hashids(min_length=25)
+        hashids = ['pO3K69b86jzc6krI416enr2B5', 'Nz7x3VXyMYerRmWeOBQn6LlRG']
+        assert list(h.decode_many(hashids)) == [(7452, 2967, 21401), (6097,)]
+
+    def test_invalid_hashids(self):
+        h = Hashids()
+        assert list(h.decode_many(['', object(), 'j0g-', 'jR'])) == \
+            [(), (), (), (1,)]
+
+
+class TestArrays(object):
+    def test_encode_array(self):
+        pytest.importorskip('numpy')
+        h = Hashids(min_length=25)
+        values = [7452, 6097, 0, 2 ** 64 - 1]
+        assert list(h.encode_array(values)) == [h.encode(v) for v in values]
+
+    def test_encode_array_invalid(self):
+        numpy = pytest.importorskip('numpy')
+        h = Hashids()
+        for values in [numpy.array([-1, 5]),
+                       numpy.array([1.7, 1.0, numpy.nan]),
+                       [-1, 2 ** 64, 2 ** 64 - 1], ['5', None, 7]]:
+            expected = [h.encode(int(v)) if hashids._is_uint64(v) else ''
+                        for v in values]
+            assert h.encode_array(values).tolist() == expected
+        assert h.encode_array(numpy.array([-1, 5])).tolist() == \
+            ['', h.encode(5)]
+
+    def test_decode_array(self):
+        pytest.importorskip('numpy')
+        h = Hashids(min_length=8)
+        hashids = [h.encode(1), h.encode(2 ** 64 - 1), h.encode(1, 2),
+                   h.encode(2 ** 64), 'j0g-', '']
+        values, valid = h.decode_array(hashids)
+        assert values.tolist() == [1, 2 ** 64 - 1, 0, 0, 0, 0]
+        assert valid.tolist() == [True, True, False, False, False, False]
+
+    def test_padded_arrays(self):
+        pytest.importorskip('numpy')
+        values = [0, 1, 99, 100, 7452, 2 ** 40, 2 ** 64 - 1]
+        for min_length in [3, 4, 5, 16]:
+            h = Hashids('salt', min_length)
+            encoded = [h.encode(v) for v in values]
+            assert h.encode_array(values).tolist() == encoded
+            hashids = encoded + [x[1:] + x[0] for x in encoded]
+            expected = [h.decode(x) for x in hashids]
+            values_, valid = h.decode_array(hashids)
+            assert valid.tolist() == [bool(x) for x in expected]
+            assert values_.tolist() == [x[0] if x else 0 for x in expected]
+
+    def test_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(hashids, 'numpy', None)
+        h = Hashids()
+        assert h.encode_array([1, 22, 333]) == ['jR', 'Lw', 'Z0E']
+        assert h.encode_array([-1, 1.7, 2 ** 64, 1.0]) == ['', '', '', 'jR']
+        assert h.decode_array(['jR', 'o2fXhV', 'xyz']) == \
+            ([1, 0, 0], [True, False, False])
+
+
+class TestColumns(object):
+    def test_encode_columns(self):
+        numpy = pytest.importorskip('numpy')
+        for h in [Hashids('salt', 20),
+                  Hashids('salt', 5, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6')]:
+            values = [7452, 6097, 0, 2 ** 64 - 1]
+            data, offsets = h.encode_columns(values)
+            assert offsets.dtype == numpy.int32
+            hashids = [h.encode(v).encode('utf-8') for v in values]
+            assert data == b''.join(hashids)
+            assert [data[start:end] for start, end in
+                    zip(offsets[:-1], offsets[1:])] == hashids
+            assert h.encode_columns(values, True)[1].dtype == numpy.int64
+
+    def test_decode_columns(self):
+        pytest.importorskip('numpy')
+        for h in [Hashids('salt', 8),
+                  Hashids('salt', 5, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6')]:
+            hashids = [h.encode(1), h.encode(2 ** 64 - 1), h.encode(1, 2),
+                       u'j0g-', u'', u'a' * 100]
+            data = b'--' + b''.join(x.encode('utf-8') for x in hashids)
+            offsets = [2]
+            for hashid in hashids:
+                offsets.append(offsets[-1] + len(hashid.encode('utf-8')))
+            values, valid = h.decode_columns(memoryview(data), offsets)
+            assert values.tolist() == [1, 2 ** 64 - 1, 0, 0, 0, 0]
+            assert valid.tolist() == [True, True] + [False] * 4
+
+    def test_empty(self):
+        pytest.importorskip('numpy')
+        data, offsets = Hashids().encode_columns([])
+        assert (data, offsets.tolist()) == (b'', [0])
+        values, valid = Hashids().decode_columns(data, offsets)
+        assert (values.tolist(), valid.tolist()) == ([], [])
+
+    def test_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(hashids, 'numpy', None)
+        h = Hashids()
+        data, offsets = h.encode_columns([1, 22, 333])
+        assert (data, offsets) == (b'jRLwZ0E', array('i', [0, 2, 4, 7]))
+        assert h.encode_columns([1], True)[1].typecode == 'q'
+        assert h.decode_columns(b'jRLwxyz', offsets) == \
+            ([1, 22, 0], [True, True, False])
+
+
+class TestBuffers(object):
+    def test_encode_into(self):
+        h = Hashids('salt', 8)
+        buffer = bytearray(b'-' * 24)
+        view = memoryview(buffer)
+        assert h.encode_into(buffer, 0, 1, 2, 3) == 8
+        assert h.encode_into(view, 10, 1 << 64) == len(h.encode(1 << 64))
+        assert h.encode_into(buffer, 20, -1) == 0
+        expected = (h.encode(1, 2, 3) + '--' + h.encode(1 << 64)).encode()
+        assert bytes(buffer).rstrip(b'-') == expected
+
+    def test_encode_into_too_small(self):
+        buffer = bytearray(5)
+        pytest.raises(ValueError, Hashids().encode_into, buffer, 0, 1, 2, 3)
+        pytest.raises(ValueError, Hashids().encode_into, buffer, 4, 1, 2)
+        assert buffer == bytearray(5)
+
+    def test_decode_into(self):
+        h = Hashids('salt', 8)
+        frame = b'ids:' + h.encode(7, 8, 9).encode() + b';xyz'
+        out = array('Q', [0] * 5)
+        assert h.decode_into(frame, out, 4, 8, out_offset=1) == 3
+        assert out.tolist() == [0, 7, 8, 9, 0]
+        assert h.decode_into(frame, out, 4) == 0
+        assert h.decode_into(b'\xff\xfe', out) == 0
+        pytest.raises(ValueError, h.decode_into, frame, out, 4, 8,
+                      out_offset=3)
+        pytest.raises(ValueError, h.decode_into, frame, out, -9, 8)
+        pytest.raises(ValueError, h.decode_into, frame, out, 4, -1)
+        assert out.tolist() == [0, 7, 8, 9, 0]
+
+    def test_decode_into_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        h = Hashids()
+        out = numpy.zeros(2, dtype=numpy.uint64)
+        assert h.decode_into(memoryview(h.encode(2 ** 64 - 1, 5).encode()),
+                             out) == 2
+        assert out.tolist() == [2 ** 64 - 1, 5]
+
+
+class TestScan(object):
+    def setup_method(self, method):
+        self.hashids = Hashids('salt', 6)
+        encode = self.hashids.encode
+        self.text = (u'GET /orders/%s/items?ref=%s HTTP/1.1\n' %
+                     (encode(1, 2, 3), encode(456)) +
+                     u'hashids: %s,%s;%s %s\n' %
+                     (encode(7), encode(7)[::-1], encode(1 << 70), u'a' * 50))
+        self.expected = [
+            (12, encode(1, 2, 3), (1, 2, 3)),
+            (12 + len(encode(1, 2, 3)) + 11, encode(456), (456,))]
+        offset = self.text.index(u'hashids: ') + 9
+        self.expected += [(offset, encode(7), (7,)),
+                          (self.text.index(encode(1 << 70)), encode(1 << 70),
+                           (1 << 70,))]
+
+    def test_text(self):
+        assert list(self.hashids.scan(self.text)) == self.expected
+
+    def test_bytes(self):
+        data = self.text.encode('ascii')
+        assert list(self.hashids.scan(data)) == self.expected
+        assert list(self.hashids.scan(memoryview(data))) == self.expected
+
+    def test_streams(self):
+        for chunk_size in [32, 64, 4096]:
+            expected = [x for x in self.expected if len(x[1]) < chunk_size]
+            assert list(self.hashids.scan(io.StringIO(self.text),
+                                          chunk_size)) == expected
+            assert list(self.hashids.scan(
+                io.BytesIO(self.text.encode('ascii')),
+                chunk_size)) == expected
+
+    def test_long_runs(self):
+        encode = self.hashids.encode
+        text = u'x' * 100 + u' ' + encode(5) + u' ' + u'y' * 100 + encode(6)
+        assert list(self.hashids.scan(io.StringIO(text), 16)) == \
+            [(101, encode(5), (5,))]
+        text = u'x' * 100 + u' ' + encode(6)
+        assert list(self.hashids.scan(io.StringIO(text), 16)) == \
+            [(101, encode(6), (6,))]
+
+    def test_mmap(self, tmpdir):
+        path = tmpdir.join('log')
+        path.write_binary(self.text.encode('ascii'))
+        with path.open('rb') as log:
+            data = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+            assert list(self.hashids.scan(data)) == self.expected
+            assert list(self.hashids.scan(data, 4)) == self.expected
+            assert data.tell() == 0
+            data.close()
+
+    def test_non_ascii(self):
+        h = Hashids('salt', 0, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6\xfc')
+        hashids = [h.encode(i) for i in range(2000)]
+        text = u' \xe9'.join(hashids)
+        data = text.encode('utf-8')
+        expected = list(h.scan(text))
+        assert [x[1:] for x in expected] == \
+            [(hashid, (i,)) for i, hashid in enumerate(hashids)]
+        assert list(h.scan(io.BytesIO(data), 64)) == \
+            [(len(text[:offset].encode('utf-8')), hashid, values)
+             for offset, hashid, values in expected]
+
+    def test_non_ascii_neighbours(self):
+        h = Hashids('salt', 0, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6')
+        hashid = h.encode(123)
+        for before, after in product(
+                [u'x\xa4', u'\xa4', u'\u20ac', u'\xe4', u'\xe4!'], [u' ', u'']):
+            text = before + hashid + after
+            expected = list(h.scan(text))
+            assert [x[1] for x in expected] == \
+                ([hashid] if before[-1] != u'\xe4' else [])
+            data = text.encode('utf-8')
+            assert list(h.scan(data)) == list(h.scan(io.BytesIO(data), 64)) \
+                == [(len(text[:offset].encode('utf-8')), hashid, values)
+                    for offset, hashid, values in expected]
+
+
+class TestParallel(object):
+    def test_encode_parallel(self):
+        h = Hashids('salt', 10)
+        values = [(i, 7 * i) for i in range(2000)]
+        assert list(h.encode_parallel(values, 2, chunk_size=300)) == \
+            list(h.encode_many(values))
+
+    def test_decode_parallel(self):
+        h = Hashids('salt', 10)
+        hashids = [h.encode(i) for i in range(2000)] + ['', 'j0g-']
+        assert list(h.decode_parallel(hashids, 2, chunk_size=300)) == \
+            list(h.decode_many(hashids))
+
+
+class AsyncSource(object):
+    """An asynchronous iterator over `items`, written without async
+    syntax."""
+    def __init__(self, items):
+        self.items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        future = asyncio.get_event_loop().create_future()
+        try:
+            future.set_result(next(self.items))
+        except StopIteration:
+            future.set_exception(StopAsyncIteration())
+        return future
+
+
+class TestThreaded(object):
+    def test_encode(self):
+        h = Hashids('salt', 8)
+        values = [(i, i * 7) for i in range(2500)]
+        expected = list(h.encode_many(values))
+        assert list(h.encode_threaded(values, 4, chunk_size=100)) == expected
+
+    def test_decode(self):
+        h = Hashids('salt', result_cache_size=1024)
+        hashids = [h.encode(i) for i in range(2500)] + ['xyz']
+        decoded = list(h.decode_threaded(hashids, 4, chunk_size=100))
+        assert decoded == [(i,) for i in range(2500)] + [()]
+
+    def test_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        h = Hashids('salt')
+        with ThreadPoolExecutor(2) as executor:
+            for _ in range(3):
+                assert list(h.encode_threaded([(1,), (2,)], 2, 1,
+                                              executor)) == ['XG', 'dv']
+
+
+class TestAsync(object):
+    def collect(self, async_iterator):
+        asyncio = pytest.importorskip('asyncio')
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        results = []
+        try:
+            while True:
+                try:
+                    results.append(
+                        loop.run_until_complete(async_iterator.__anext__()))
+                except StopAsyncIteration:
+                    return results
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_encode_async(self):
+        h = Hashids('salt', 8)
+        values = [(i, i) for i in range(250)]
+        assert self.collect(h.encode_async(values, chunk_size=100)) == \
+            list(h.encode_many(values))
+
+    def test_decode_async(self):
+        h = Hashids('salt', 8)
+        hashids = [h.encode(i) for i in range(250)] + ['xyz']
+        assert self.collect(h.decode_async(hashids, chunk_size=100)) == \
+            [(i,) for i in range(250)] + [()]
+
+    def test_async_source(self):
+        h = Hashids()
+        values = [(i,) for i in range(25)]
+        assert self.collect(h.encode_async(AsyncSource(values),
+                                           chunk_size=10)) == \
+            list(h.encode_many(values))
+
+    def test_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        h = Hashids()
+        hashids = [h.encode(i) for i in range(250)]
+        with ThreadPoolExecutor(2) as executor:
+            assert self.collect(h.decode_async(hashids, chunk_size=100,
+                                               executor=executor)) == \
+                [(i,) for i in range(250)]
+
+    def test_empty(self):
+        assert self.collect(Hashids().encode_async([])) == []
+
+
+class TestKeyring(object):
+    def test_match(self):
+        old, new = Hashids('old salt', 12), Hashids('new salt', 12)
+        keyring = hashids.HashidsKeyring([new, old])
+        assert keyring.match(new.encode(1, 2, 3)) == (new, (1, 2, 3))
+        assert keyring.match(old.encode(1, 2, 3)) == (old, (1, 2, 3))
+        assert keyring.match(old.encode(1 << 100)) == (old, (1 << 100,))
+        assert keyring.match('xyz') == (None, ())
+        assert keyring.match(None) == (None, ())
+
+    def test_matches_sequential_decoding(self):
+        keyring = hashids.HashidsKeyring.from_salts(
+            ['salt %d' % i for i in range(5)], 8)
+        for member in keyring.members:
+            for values in [(1,), (123456,), (1, 2), (99, 25, 7)]:
+                hashid = member.encode(*values)
+                for candidate in [hashid, hashid[::-1], hashid[1:] + 'a']:
+                    expected = next(((h, h.decode(candidate))
+                                     for h in keyring.members
+                                     if h.decode(candidate)), (None, ()))
+                    assert keyring.match(candidate) == expected
+
+    def test_mixed_members(self):
+        keyring = hashids.HashidsKeyring([
+            Hashids('a'), Hashids('b', 10),
+            Hashids('c', 0, 'abcdefghijklmnop'),
+            Hashids('d', 6, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6\xfc'),
+            Hashids('e', 10, 'abcdefghijklmnopqrstuvwxyz')])
+        for member in keyring.members:
+            for values in [(0,), (7,), (123456,), (5, 0, 42)]:
+                hashid = member.encode(*values)
+                for candidate in [hashid, hashid[::-1], hashid[:-1],
+                                  u'x' + hashid]:
+                    expected = next(((h, h.decode(candidate))
+                                     for h in keyring.members
+                                     if h.decode(candidate)), (None, ()))
+                    assert keyring.match(candidate) == expected
+
+    def test_skips_members(self, monkeypatch):
+        visited = []
+
+        def recording(function):
+            def wrapper(hashid, member, *args):
+                visited.append(member)
+                return function(hashid, member, *args)
+            return wrapper
+
+        for name in ['_may_match', '_first_value_may_match']:
+            monkeypatch.setattr(hashids, name,
+                                recording(getattr(hashids, name)))
+        keyring = hashids.HashidsKeyring.from_salts(
+            ['salt %d' % i for i in range(10)], 12)
+        # Shorter than the minimum length of all members.
+        assert keyring.match(u'abc') == (None, ())
+        assert visited == []
+        keyring = hashids.HashidsKeyring(
+            [Hashids('a'), Hashids('b', 0, 'abcdefghijklmnop')])
+        # Contains characters the second member does not use.
+        assert keyring.match(u'3K9') == (keyring.members[0], (123,))
+        assert visited == [keyring.members[0]]
+
+    def test_encode_and_decode(self):
+        keyring = hashids.HashidsKeyring.from_salts(['new salt', 'old salt'])
+        assert keyring.encode(1, 2, 3) == Hashids('new salt').encode(1, 2, 3)
+        assert keyring.decode(Hashids('old salt').encode(5)) == (5,)
+
+    def test_empty(self):
+        pytest.raises(ValueError, hashids.HashidsKeyring, [])
+
+
+class TestTable(object):
+    def test_matches_hashids(self, tmpdir):
+        for h in [Hashids(), Hashids('salt', 12),
+                  Hashids('salt', 3, u'abcdefghijklmnopqrstuvwxyz\xe4\xf6')]:
+            path = str(tmpdir.join('table'))
+            with hashids.HashidsTable.build(h, path, 2000) as table:
+                assert table.bound == 2000
+                for value in list(range(2000)) + [2000, 123456]:
+                    hashid = h.encode(value)
+                    assert table.encode(value) == hashid
+                    assert table.decode(hashid) == (value,)
+
+    def test_fallback(self, tmpdir):
+        h = Hashids('salt')
+        table = hashids.HashidsTable.build(h, str(tmpdir.join('table')), 100)
+        assert table.encode(1, 2, 3) == h.encode(1, 2, 3)
+        assert table.decode(h.encode(1, 2, 3)) == (1, 2, 3)
+        assert table.encode(-1) == ''
+        assert table.decode('xyz') == ()
+        assert table.decode('') == ()
+
+    def test_invalid(self, tmpdir):
+        h = Hashids()
+        table = hashids.HashidsTable.build(h, str(tmpdir.join('table')), 100)
+        for value in range(100):
+            assert table.decode(h.encode(value) + u'\0') == ()
+        pytest.raises(TypeError, table.encode, 3.0)
+        pytest.raises(TypeError, h.encode, 3.0)
+
+    def test_open(self, tmpdir):
+        path = str(tmpdir.join('table'))
+        hashids.HashidsTable.build(Hashids('salt', 8), path, 100).close()
+        table = hashids.HashidsTable(path, Hashids('salt', 8))
+        assert table.decode(table.encode(42)) == (42,)
+        pytest.raises(ValueError, hashids.HashidsTable, path, Hashids('salt'))
+        tmpdir.join('other').write('not a table')
+        pytest.raises(ValueError, hashids.HashidsTable,
+                      str(tmpdir.join('other')), Hashids('salt', 8))
+
+
+class TestCommandLine(object):
+    def test_encode(self, tmpdir, capsys):
+        infile = tmpdir.join('values.txt')
+        infile.write('1\n1,2,3\nfoo\n12345\n')
+        hashids._main(['encode', str(infile)])
+        assert capsys.readouterr()[0] == 'jR\no2fXhV\n\nj0gW\n'
+
+    def test_decode(self, tmpdir, capsys):
+        infile = tmpdir.join('hashids.txt')
+        infile.write('gyOwl4B97bo2fXhVaDR0Znjrq\nxyz\n')
+        hashids._main(['decode', '--min-length', '25', str(infile)])
+        assert capsys.readouterr()[0] == '1,2,3\n\n'
+
+    def test_hex(self, tmpdir, capsys):
+        infile = tmpdir.join('hex.txt')
+        infile.write('507f1f77bcf86cd799439011\n')
+        hashids._main(['encode-hex', str(infile)])
+        assert capsys.readouterr()[0] == 'y42LW46J9luq3Xq9XMly\n'
+        infile.write('y42LW46J9luq3Xq9XMly\n')
+        hashids._main(['decode-hex', str(infile)])
+        assert capsys.readouterr()[0] == '507f1f77bcf86cd799439011\n'
+
+    def test_standard_streams(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'hashids', 'encode', '-l', '8'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=root)
+        output = process.communicate(b'1\n1,2,3\nfoo\n')[0]
+        h = Hashids(min_length=8)
+        assert output.splitlines() == [h.encode(1).encode(),
+                                       h.encode(1, 2, 3).encode(), b'']
+
+
 class TestDecoding(object):
     def test_empty_string(self):
         assert Hashids().decode('') == ()
@@ -156,6 +995,9 @@ class TestDecoding(object):
     def test_invalid_hash(self):
         assert Hashids(alphabet='abcdefghijklmnop').decode('qrstuvwxyz') == ()
 
+    def test_character_outside_alphabet(self):
+        assert Hashids().decode('j0g-') == ()
+
     def test_alphabet_without_standard_separators(self):
         h = Hashids(alphabet='abdegjklmnopqrvwxyzABDEGJKLMNOPQRVWXYZ1234567890')
         assert h.decode('X50Yg6VPoAO4') == (7452, 2967, 21401)
@@ -170,6 +1012,15 @@ class TestDecoding(object):
         assert h.decode('38V1D') == (60125,)
         assert h.decode('373az') == (99, 25)
 
+    def test_leading_zero_digit(self):
+        assert Hashids().decode('nQR') == ()
+
+    def test_wrong_separator(self):
+        assert Hashids().decode('o2cXhV') == ()
+
+    def test_unexpected_guard(self):
+        assert Hashids().decode('ao2fXhV') == ()
+
     def test_only_one_valid(self):
         h = Hashids(min_length=6)
         assert h.decode(h.encode(1)[:-1] + '0') == ()
@@ -182,6 +1033,24 @@ class TestDecoding(object):
         assert Hashids().decode_hex('WxMLpERDrmh25Lp4L3xEfM6WovWYO3IjkRMKR2ogCMVzn4zQlqt1WK8jKq7OsEpy2qyw1Vi2p') == \
                'f000000000000000000000000000000000000000000000000000000000000000000000000000000000000f'
 
+    def test_decode_bytes(self):
+        assert Hashids().decode_bytes('y42LW46J9luq3Xq9XMly') == \
+            b'\x50\x7f\x1f\x77\xbc\xf8\x6c\xd7\x99\x43\x90\x11'
+        h = Hashids(min_length=10)
+        assert h.decode_bytes(h.encode_bytes(b'\x00' * 13)) == b'\x00' * 13
+
+    def test_illegal_decode_bytes(self):
+        h = Hashids()
+        assert h.decode_bytes('') == b''
+        assert h.decode_bytes(h.encode_hex('abc')) == b''
+        assert h.decode_bytes(h.encode(0)) == b''
+
+    def test_decode_uuid(self):
+        h = Hashids(min_length=10)
+        uuid = UUID('01234567-89ab-cdef-0123-456789abcdef')
+        assert h.decode_uuid(h.encode_uuid(uuid)) == uuid
+        assert h.decode_uuid(h.encode_hex('abcd')) is None
+
     def test_illegal_decode_hex(self):
         assert Hashids().decode_hex('') == ''
         assert Hashids().decode_hex('WxMLpERDrmh25Lp4L3xEfM6WovWYO3IjkRMKR2ogCMVlqt1WK8jKq7OsEp1Vi2p') == ''